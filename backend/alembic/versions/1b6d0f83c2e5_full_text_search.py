@@ -0,0 +1,40 @@
+"""full text search
+
+Revision ID: 1b6d0f83c2e5
+Revises: f0b3a7c95d28
+Create Date: 2026-10-18 15:02:44.318870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b6d0f83c2e5'
+down_revision: Union[str, None] = 'f0b3a7c95d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        ALTER TABLE entries ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(entry_text, '')), 'B')
+        ) STORED
+    """)
+    op.execute("""
+        ALTER TABLE notes ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS entries_search_idx ON entries USING GIN (search_vector)")
+    op.execute("CREATE INDEX IF NOT EXISTS notes_search_idx ON notes USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS notes_search_idx")
+    op.execute("DROP INDEX IF EXISTS entries_search_idx")
+    op.drop_column('notes', 'search_vector')
+    op.drop_column('entries', 'search_vector')
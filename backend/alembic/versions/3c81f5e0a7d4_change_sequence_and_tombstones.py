@@ -0,0 +1,85 @@
+"""change sequence and tombstones
+
+Revision ID: 3c81f5e0a7d4
+Revises: 7e4a19c3d2b6
+Create Date: 2026-10-18 17:26:51.904612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c81f5e0a7d4'
+down_revision: Union[str, None] = '7e4a19c3d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED_TABLES = {'entries': 'entry', 'notes': 'note', 'user_moods': 'user_mood'}
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS change_seq")
+    for table in TRACKED_TABLES:
+        # Existing rows are numbered once by the volatile default, then the trigger takes over
+        op.execute(f"ALTER TABLE {table} ADD COLUMN change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN change_seq SET DEFAULT 0")
+        op.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMPTZ NOT NULL DEFAULT now()")
+        op.execute(f"CREATE INDEX IF NOT EXISTS {table}_user_change_seq_idx ON {table} (user_id, change_seq)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS deletions (
+            seq BIGINT PRIMARY KEY DEFAULT nextval('change_seq'),
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            kind VARCHAR(20) NOT NULL,
+            row_id VARCHAR(255) NOT NULL,
+            deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS deletions_user_seq_idx ON deletions (user_id, seq)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION touch_change_seq() RETURNS trigger AS $$
+        BEGIN
+            PERFORM 1 FROM users WHERE id = NEW.user_id FOR NO KEY UPDATE;
+            NEW.change_seq := nextval('change_seq');
+            NEW.updated_at := now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION record_deletion() RETURNS trigger AS $$
+        BEGIN
+            PERFORM 1 FROM users WHERE id = OLD.user_id FOR NO KEY UPDATE;
+            IF FOUND THEN
+                INSERT INTO deletions (user_id, kind, row_id) VALUES (OLD.user_id, TG_ARGV[0], OLD.id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, kind in TRACKED_TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_change_seq BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION touch_change_seq()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION record_deletion('{kind}')
+        """)
+
+
+def downgrade() -> None:
+    for table in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_change_seq ON {table}")
+        op.execute(f"DROP INDEX IF EXISTS {table}_user_change_seq_idx")
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'change_seq')
+    op.execute("DROP FUNCTION IF EXISTS record_deletion()")
+    op.execute("DROP FUNCTION IF EXISTS touch_change_seq()")
+    op.execute("DROP TABLE IF EXISTS deletions")
+    op.execute("DROP SEQUENCE IF EXISTS change_seq")
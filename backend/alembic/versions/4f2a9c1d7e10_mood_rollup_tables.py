@@ -0,0 +1,43 @@
+"""mood rollup tables
+
+Revision ID: 4f2a9c1d7e10
+Revises: 8637a2ae1348
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c1d7e10'
+down_revision: Union[str, None] = '8637a2ae1348'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            bucket VARCHAR(5) NOT NULL CHECK (bucket IN ('day', 'week', 'month')),
+            bucket_start date NOT NULL,
+            user_mood_id INTEGER NOT NULL REFERENCES user_moods(id) ON DELETE CASCADE,
+            entry_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, bucket, bucket_start, user_mood_id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO mood_rollups (user_id, bucket, bucket_start, user_mood_id, entry_count)
+        SELECT e.user_id, b.bucket, date_trunc(b.bucket, e.date)::date, e.user_mood_id, COUNT(*)
+        FROM entries e
+        CROSS JOIN unnest(ARRAY['day', 'week', 'month']) AS b(bucket)
+        WHERE e.user_mood_id IS NOT NULL AND e.user_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS mood_rollups")
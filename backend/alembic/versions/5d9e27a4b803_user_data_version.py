@@ -0,0 +1,26 @@
+"""user data version
+
+Revision ID: 5d9e27a4b803
+Revises: e3c58b6f0a41
+Create Date: 2026-10-18 11:26:03.884190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9e27a4b803'
+down_revision: Union[str, None] = 'e3c58b6f0a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('data_version', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_version')
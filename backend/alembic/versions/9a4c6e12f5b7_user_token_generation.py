@@ -0,0 +1,26 @@
+"""user token generation
+
+Revision ID: 9a4c6e12f5b7
+Revises: 5d9e27a4b803
+Create Date: 2026-10-18 12:47:39.206518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c6e12f5b7'
+down_revision: Union[str, None] = '5d9e27a4b803'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_generation', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_generation')
@@ -0,0 +1,28 @@
+"""sync floor
+
+Revision ID: a6d3f1b89e24
+Revises: 3c81f5e0a7d4
+Create Date: 2026-10-18 21:04:12.318840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d3f1b89e24'
+down_revision: Union[str, None] = '3c81f5e0a7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('sync_floor', sa.BigInteger(), nullable=False, server_default='0'))
+    op.execute("CREATE INDEX IF NOT EXISTS deletions_deleted_at_idx ON deletions (deleted_at)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS deletions_deleted_at_idx")
+    op.drop_column('users', 'sync_floor')
@@ -0,0 +1,26 @@
+"""entries keyset index
+
+Revision ID: b71e0d3a5c92
+Revises: 4f2a9c1d7e10
+Create Date: 2026-10-18 10:04:57.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e0d3a5c92'
+down_revision: Union[str, None] = '4f2a9c1d7e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS entries_user_date_id_idx ON entries (user_id, date, id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS entries_user_date_id_idx")
@@ -0,0 +1,27 @@
+"""entry image variants
+
+Revision ID: c2f8d4e61a93
+Revises: 9a4c6e12f5b7
+Create Date: 2026-10-18 13:35:50.771264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f8d4e61a93'
+down_revision: Union[str, None] = '9a4c6e12f5b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('entries', sa.Column('image_variants', postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('entries', 'image_variants')
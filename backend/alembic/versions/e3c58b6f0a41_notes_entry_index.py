@@ -0,0 +1,26 @@
+"""notes entry index
+
+Revision ID: e3c58b6f0a41
+Revises: b71e0d3a5c92
+Create Date: 2026-10-18 10:41:12.530884
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3c58b6f0a41'
+down_revision: Union[str, None] = 'b71e0d3a5c92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS notes_user_entry_idx ON notes (user_id, entry_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS notes_user_entry_idx")
@@ -0,0 +1,28 @@
+"""upload reference indexes
+
+Revision ID: f0b3a7c95d28
+Revises: c2f8d4e61a93
+Create Date: 2026-10-18 14:21:08.649517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0b3a7c95d28'
+down_revision: Union[str, None] = 'c2f8d4e61a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS entries_image_name_idx ON entries ((regexp_replace(image_path, '^.*/', '')))")
+    op.execute("CREATE INDEX IF NOT EXISTS entries_image_hash_idx ON entries ((image_variants->>'hash'))")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS entries_image_hash_idx")
+    op.execute("DROP INDEX IF EXISTS entries_image_name_idx")
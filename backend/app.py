@@ -1,61 +1,215 @@
-from flask import Flask, request, jsonify
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask import Flask, Response, g, has_request_context, request, jsonify, make_response, stream_with_context
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity
 from flask_sqlalchemy import SQLAlchemy
 import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, RealDictCursor
 from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
-import os, uuid, json
+from datetime import date, datetime, timedelta
+import os, io, uuid, json, atexit, hashlib, time, calendar, html
 from flask_cors import CORS
-from config import DB_CONFIG, DB_SECRET_KEY
-from contextlib import contextmanager
+from config import DB_CONFIG, DB_POOL_CONFIG, DB_SECRET_KEY, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL
+from config import BCRYPT_LOG_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_INFLIGHT, PASSWORD_HASH_EXECUTOR
+from config import TOKEN_GENERATION_CACHE_SIZE, TOKEN_GENERATION_CACHE_TTL, IMAGE_WORKERS, IMAGE_EXECUTOR
+from config import UPLOAD_ACCEL_MODE, UPLOAD_ACCEL_PREFIX
+from config import PALETTE_CACHE_SIZE, IDEMPOTENCY_KEY_TTL_DAYS
+from config import JSON_SERIALIZER, COMPRESSION_ALGORITHMS, COMPRESSION_MIN_SIZE
+from config import METRICS_TOKEN
+from config import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN_SAMPLE, SLOW_QUERY_MAX_PLANS, QUERY_STATS_MAX_FINGERPRINTS, ADMIN_USER_IDS
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from rollups import BUCKETS, record_entry_change
+from pagination import encode_cursor, decode_cursor, parse_limit, stream_json_array
+from versions import bump_data_version, fetch_data_version, data_version_etag, lock_user
+from cache import ResponseCache
+from db_pool import ConnectionPool, PoolError
+from hashing import PasswordHasher
+from revocation import DELETED, TokenGenerationCache
+from images import ImageStore
+from uploads import uploads
+from importer import JournalImportError, detect_format, import_journal
+import exporter
+from instrumentation import InstrumentedConnection, add_query_listener
+from metrics import Metrics
+from query_tracer import QueryTracer
+from insights import mood_insights, parse_range
+from batch import BatchError, apply_batch, validate_operations
+from sync import SyncCursorExpired, fetch_changes
+from projection import entry_select, parse_projection
+from serialization import init_json
+from compression import ResponseCompressor
+from mood_cache import MoodCatalog, PaletteCache, load_palette
 app = Flask(__name__)
 
 # Configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f'postgresql://{DB_CONFIG["user"]}:{DB_CONFIG["password"]}@{DB_CONFIG["host"]}:{DB_CONFIG["port"]}/{DB_CONFIG["dbname"]}'
 app.config['JWT_SECRET_KEY'] = DB_SECRET_KEY
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)  # Set token expiration
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max-limit
+app.config['UPLOAD_ACCEL_MODE'] = UPLOAD_ACCEL_MODE  # '', 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd)
+app.config['UPLOAD_ACCEL_PREFIX'] = UPLOAD_ACCEL_PREFIX
+app.config['USE_X_SENDFILE'] = UPLOAD_ACCEL_MODE == 'x-sendfile'
+init_json(app, JSON_SERIALIZER)
 
 
 # Initialize extensions
 jwt = JWTManager(app)
-bcrypt = Bcrypt(app)
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_LOG_ROUNDS,
+    workers=PASSWORD_HASH_WORKERS,
+    max_inflight=PASSWORD_HASH_MAX_INFLIGHT,
+    executor=PASSWORD_HASH_EXECUTOR,
+)
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173"], 
                                  "supports_credentials": True, 
                                  "allow_headers": ["Authorization", "Content-Type"]}})
 
+response_cache = ResponseCache(max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL)
+mood_catalog = MoodCatalog()
+palette_cache = PaletteCache(max_entries=PALETTE_CACHE_SIZE)
+
+atexit.register(password_hasher.shutdown)
+
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+app.register_blueprint(uploads)
+
+image_store = ImageStore(app.config['UPLOAD_FOLDER'], workers=IMAGE_WORKERS, executor=IMAGE_EXECUTOR)
+atexit.register(image_store.shutdown)
+
 # Constants
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ENTRIES_PAGE_DEFAULT = 100
+ENTRIES_PAGE_MAX = 500
+STREAM_FETCH_SIZE = 500
+POOL_RETRY_AFTER = 1  # seconds
+NOTES_BATCH_MAX = 100
+PALETTE_MAX = 100
+BATCH_MAX_OPERATIONS = 500
+SYNC_PAGE_DEFAULT = 500
+SYNC_PAGE_MAX = 2000
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 100
+# ts_headline marks matches with private-use sentinels; the text around them is HTML-escaped
+# before the sentinels become <mark> tags, so a snippet never carries the user's own markup
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\ue000', '\ue001'
+SEARCH_HEADLINE_OPTIONS = f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}", MinWords=5, MaxWords=20'
+SEARCH_TSQUERY = "websearch_to_tsquery('english', %(query)s)"
+SEARCH_SCOPE = """entries.user_id = %(user_id)s
+                        AND (%(start)s::date IS NULL OR entries.date >= %(start)s::date)
+                        AND (%(end)s::date IS NULL OR entries.date <= %(end)s::date)
+                        AND (%(mood_id)s::int IS NULL OR entries.user_mood_id = %(mood_id)s::int)"""
+QUERY_STATS_ORDERS = ('total_ms', 'mean_ms', 'p95_ms', 'max_ms', 'calls', 'slow')
+
+# Spelled out rather than entries.* so derived columns like search_vector never reach the client
+ENTRY_COLUMNS = ("entries.id, entries.user_id, entries.date, entries.user_mood_id, entries.title, "
+                 "entries.image_path, entries.image_variants, entries.entry_text")
 
 # Database connection pool
-connection_pool = pool.SimpleConnectionPool(
-    minconn=1,
-    maxconn=20,
+connection_pool = ConnectionPool(
     dsn=f"dbname={DB_CONFIG['dbname']} host={DB_CONFIG['host']} port={DB_CONFIG['port']} user={DB_CONFIG['user']} password={DB_CONFIG['password']}",
+    **DB_POOL_CONFIG,
+)
+
+ResponseCompressor(algorithms=COMPRESSION_ALGORITHMS, min_size=COMPRESSION_MIN_SIZE).init_app(app)
+
+metrics = Metrics()
+metrics.init_app(app, connection_pool, response_cache, password_hasher, token=METRICS_TOKEN)
+add_query_listener(metrics.observe_query)
+password_hasher.observer = metrics.observe_password_hash
+
+def query_context():
+    # Route and user for the slow-query log; either may be missing outside a JWT-protected request
+    if not has_request_context():
+        return None, None
+    route = request.url_rule.rule if request.url_rule else request.path
+    try:
+        return route, get_jwt_identity()
+    except RuntimeError:
+        return route, None
+
+@contextmanager
+def explain_connection():
+    # A raw pooled connection for the tracer's background EXPLAINs, so they aren't traced themselves
+    conn = connection_pool.getconn()
+    try:
+        yield conn
+    finally:
+        connection_pool.putconn(conn)
+
+query_tracer = QueryTracer(
+    app.logger,
+    query_context,
+    threshold_ms=SLOW_QUERY_MS,
+    sample_rate=SLOW_QUERY_EXPLAIN_SAMPLE,
+    max_plans=SLOW_QUERY_MAX_PLANS,
+    max_fingerprints=QUERY_STATS_MAX_FINGERPRINTS,
+    explain_connection=explain_connection,
 )
+add_query_listener(query_tracer.on_query)
+atexit.register(query_tracer.shutdown)
 
 # Helper functions
 @contextmanager
 def get_connection():
+    started = time.perf_counter()
     conn = connection_pool.getconn()
+    metrics.observe_checkout(time.perf_counter() - started)
     try:
-        yield conn
+        # Handlers get a proxy that times every statement; the pool only ever sees the real connection
+        yield InstrumentedConnection(conn)
     finally:
         connection_pool.putconn(conn)
 
 def release_connection(conn):
     connection_pool.putconn(conn)
 
+def load_token_generation(user_id):
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT token_generation FROM users WHERE id = %s", (user_id,))
+            row = cur.fetchone()
+        conn.rollback()
+    return row['token_generation'] if row else None
+
+token_generations = TokenGenerationCache(load_token_generation, max_entries=TOKEN_GENERATION_CACHE_SIZE,
+                                         ttl=TOKEN_GENERATION_CACHE_TTL)
+
+@jwt.token_in_blocklist_loader
+def check_token_generation(jwt_header, jwt_payload):
+    # Tokens issued before identity claims existed carry no generation; their handlers fall back to the database
+    if 'gen' not in jwt_payload:
+        return False
+    return token_generations.is_revoked(jwt_payload['sub'], jwt_payload['gen'])
+
+def issue_access_token(user_id, username, generation):
+    return create_access_token(identity=user_id, additional_claims={"username": username, "gen": generation})
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_image(file):
+    # Stored under its content hash, so re-uploading the same picture reuses the existing file.
+    # The extension comes from the same sanitized name allowed_file() checked
+    ext = secure_filename(file.filename).rsplit('.', 1)[1].lower()
+    manifest = image_store.save(file, ext)
+    return manifest['original'], manifest
+
+def highlight_snippet(snippet):
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+def admin_required(view):
+    # Goes under @jwt_required(); admins are listed by id in ADMIN_USER_IDS
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if get_jwt_identity() not in ADMIN_USER_IDS:
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
 def is_valid_uuid(val):
     try:
         uuid.UUID(str(val))
@@ -63,6 +217,74 @@ def is_valid_uuid(val):
     except ValueError:
         return False
 
+def conditional_get(view):
+    # Answers If-None-Match from the user's data version before the view runs any real query
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+
+        current_user = get_jwt_identity()
+        try:
+            with get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    version = fetch_data_version(cur, current_user)
+                conn.rollback()
+        except PoolError:
+            raise
+        except Exception as e:
+            app.logger.error(f"Error fetching data version: {str(e)}")
+            version = None
+
+        if version is None:
+            return view(*args, **kwargs)
+
+        g.data_version = version
+        etag = data_version_etag(current_user, version, request.full_path)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
+
+def cached_response(endpoint):
+    # Serves repeat GETs from response_cache; writes call invalidate_cached() for the keys they affect
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = (
+                get_jwt_identity(),
+                endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                g.get('data_version'),
+            )
+            cached = response_cache.get(key)
+            if cached is not None:
+                return Response(cached.body, status=cached.status, mimetype=cached.mimetype)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.set(key, response.get_data(), response.status_code, response.mimetype)
+            return response
+        return wrapper
+    return decorator
+
+def invalidate_cached(user_id, *endpoints, entry_id=None):
+    if entry_id is None:
+        response_cache.invalidate(user_id, endpoints or None)
+    else:
+        response_cache.invalidate(user_id, endpoints or None, match=lambda key: ('entry_id', entry_id) in key[2])
+
 # Error handlers
 @app.errorhandler(400)
 def bad_request(error):
@@ -72,10 +294,19 @@ def bad_request(error):
 def unauthorized(error):
     return jsonify(error="Unauthorized"), 401
 
+@app.errorhandler(403)
+def forbidden(error):
+    return jsonify(error="Forbidden"), 403
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify(error="Not Found"), 404
 
+@app.errorhandler(PoolError)
+def pool_unavailable(error):
+    app.logger.error(f"Connection pool error: {str(error)}")
+    return jsonify(error="Service Unavailable"), 503, {'Retry-After': str(POOL_RETRY_AFTER)}
+
 @app.errorhandler(500)
 def server_error(error):
     app.logger.error(f"Server error: {str(error)}")
@@ -94,7 +325,7 @@ def register():
         if len(password) < 8:
             return jsonify({"error": "Password must be at least 8 characters long"}), 400
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         
         with get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -108,6 +339,8 @@ def register():
 
     except psycopg2.IntegrityError:
         return jsonify({"error": "Username already exists"}), 409
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error in register endpoint: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
@@ -126,12 +359,26 @@ def login():
                 cur.execute("SELECT * FROM users WHERE username = %s", (username,))
                 user = cur.fetchone()
         
-        if not user or not bcrypt.check_password_hash(user['password'], password):
+        if not user or not password_hasher.verify(user['password'], password):
             return jsonify({"error": "Invalid username or password"}), 401
-        
-        access_token = create_access_token(identity=user['id'])
+
+        if password_hasher.needs_rehash(user['password']):
+            # Upgrade the stored hash to the configured work factor while we have the plaintext
+            try:
+                rehashed_password = password_hasher.hash(password)
+                with get_connection() as conn:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                        cur.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                                    (rehashed_password, user['id'], user['password']))
+                        conn.commit()
+            except Exception as e:
+                app.logger.error(f"Error rehashing password: {str(e)}")
+
+        access_token = issue_access_token(user['id'], user['username'], user['token_generation'])
         return jsonify(access_token=access_token), 200
 
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error in login endpoint: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
@@ -142,6 +389,13 @@ def login():
 def protected():
     try:
         current_user = get_jwt_identity()
+        claims = get_jwt()
+
+        if 'username' in claims:
+            return jsonify({
+                "username": claims['username'],
+                "user_id": current_user
+            }), 200
 
         with get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -156,40 +410,57 @@ def protected():
         else:
             return jsonify({"error": "User not found"}), 404
 
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error in protected endpoint: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app.route('/api/entries', methods=['GET', 'POST'])
 @jwt_required()
+@conditional_get
+@cached_response('entries')
 def entries():
     current_user = get_jwt_identity()
 
     if request.method == 'GET':
         start_date = request.args.get('startDate')
         end_date = request.args.get('endDate')
-        user_id = request.args.get('userId')
 
         if not all([start_date, end_date]):
             return jsonify({"error": "Missing required parameters"}), 400
 
+        try:
+            fields, preview_length = parse_projection(request.args.get('fields'), request.args.get('view'),
+                                                      request.args.get('preview'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        columns, joins = entry_select(fields, preview_length)
+
+        if request.args.get('stream') in ('1', 'true'):
+            return stream_entries(current_user, start_date, end_date, columns, joins)
+
+        if 'limit' in request.args or 'cursor' in request.args:
+            return paginate_entries(current_user, start_date, end_date, columns, joins)
+
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("""
-                        SELECT entries.*, user_moods.color AS mood_color, moods.name AS mood_name
+                    cur.execute(f"""
+                        SELECT {columns}
                         FROM entries
-                        LEFT JOIN user_moods ON entries.user_mood_id = user_moods.id
-                        LEFT JOIN moods ON user_moods.mood_id = moods.id
+                        {joins}
                         WHERE entries.user_id = %s 
                         AND entries.date >= %s
                         AND entries.date <= %s
                         ORDER BY entries.id
-                    """, (user_id, start_date, end_date))
+                    """, (current_user, start_date, end_date))
                     entries = cur.fetchall()
             
             return jsonify(entries)
 
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error fetching entries: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -211,37 +482,116 @@ def entries():
 
         try:
             image_path = None
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+            image_variants = None
+            if file and allowed_file(secure_filename(file.filename)):
+                unique_filename, image_variants = save_image(file)
                 image_path = f"../../backend/static/uploads/{unique_filename}"
 
             new_entry_id = f'{current_user}_{data["date"]}'
 
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    lock_user(cur, current_user)
+                    cur.execute("SELECT date, user_mood_id FROM entries WHERE id = %s FOR UPDATE", (new_entry_id,))
+                    previous = cur.fetchone()
                     cur.execute("""
-                        INSERT INTO entries (id, user_id, date, user_mood_id, title, image_path, entry_text)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        INSERT INTO entries (id, user_id, date, user_mood_id, title, image_path, image_variants, entry_text)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                         ON CONFLICT (id) DO UPDATE
                         SET user_mood_id = EXCLUDED.user_mood_id,
                             title = EXCLUDED.title,
                             image_path = COALESCE(EXCLUDED.image_path, entries.image_path),
+                            image_variants = CASE WHEN EXCLUDED.image_path IS NULL THEN entries.image_variants ELSE EXCLUDED.image_variants END,
                             entry_text = EXCLUDED.entry_text
-                        RETURNING id
+                        RETURNING id, date, user_mood_id
                         """, 
-                        (new_entry_id, current_user, data['date'], data['user_mood_id'], data['title'], image_path, data['entry_text']))
-                    new_entry_id = cur.fetchone()['id']
+                        (new_entry_id, current_user, data['date'], data['user_mood_id'], data['title'], image_path,
+                         Json(image_variants) if image_variants else None, data['entry_text']))
+                    saved = cur.fetchone()
+                    new_entry_id = saved['id']
+                    record_entry_change(cur, current_user,
+                                        old=(previous['date'], previous['user_mood_id']) if previous else None,
+                                        new=(saved['date'], saved['user_mood_id']))
+                    bump_data_version(cur, current_user)
                     conn.commit()
 
+            invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
             return jsonify({"entry_id": new_entry_id})
 
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error creating/updating entry: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
 
+def paginate_entries(user_id, start_date, end_date, columns, joins):
+    try:
+        limit = parse_limit(request.args.get('limit'), ENTRIES_PAGE_DEFAULT, ENTRIES_PAGE_MAX)
+        after = decode_cursor(request.args['cursor'], 2, (date.fromisoformat, str)) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"""
+                    SELECT {columns}
+                    FROM entries
+                    {joins}
+                    WHERE entries.user_id = %(user_id)s
+                    AND entries.date >= %(start)s
+                    AND entries.date <= %(end)s
+                    AND (%(after_date)s::date IS NULL OR (entries.date, entries.id) > (%(after_date)s::date, %(after_id)s))
+                    ORDER BY entries.date, entries.id
+                    LIMIT %(limit)s
+                """, {'user_id': user_id, 'start': start_date, 'end': end_date,
+                      'after_date': after[0] if after else None, 'after_id': after[1] if after else None,
+                      'limit': limit + 1})
+                page = cur.fetchall()
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1]['date'], page[-1]['id'])
+
+        return jsonify({"entries": page, "next": next_cursor})
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching entries page: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+def stream_entries(user_id, start_date, end_date, columns, joins):
+    # Checked out before the response starts, so an exhausted pool is still a 503;
+    # the connection goes back when the server closes the response
+    resources = ExitStack()
+    conn = resources.enter_context(get_connection())
+
+    def generate():
+        try:
+            # A named cursor keeps the result set on the server and pulls it in itersize batches
+            with conn.cursor(name=f"entries_stream_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = STREAM_FETCH_SIZE
+                cur.execute(f"""
+                    SELECT {columns}
+                    FROM entries
+                    {joins}
+                    WHERE entries.user_id = %s
+                    AND entries.date >= %s
+                    AND entries.date <= %s
+                    ORDER BY entries.date, entries.id
+                """, (user_id, start_date, end_date))
+                yield from stream_json_array(cur, app.json.dumps)
+        except Exception as e:
+            app.logger.error(f"Error streaming entries: {str(e)}")
+            raise
+        finally:
+            conn.rollback()
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.call_on_close(resources.close)
+    return response
+
 @app.route('/api/moods', methods=['POST'])
 @jwt_required()
 def moods():
@@ -258,16 +608,9 @@ def moods():
     try:
         with get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT id, name FROM moods WHERE name = %s", (mood_name,))
-                existing_mood = cur.fetchone()
-                
-                if existing_mood:
-                    mood_id = existing_mood['id']
-                    is_new = False
-                else:
-                    cur.execute("INSERT INTO moods (name) VALUES (%s) RETURNING id", (mood_name,))
-                    mood_id = cur.fetchone()['id']
-                    is_new = True
+                resolved = mood_catalog.resolve(cur, [mood_name])
+                mood_id = resolved[mood_name]['id']
+                is_new = resolved[mood_name]['is_new']
 
                 user_mood_id = None
                 if color:
@@ -278,9 +621,14 @@ def moods():
                         RETURNING id
                     """, (current_user, mood_id, color))
                     user_mood_id = cur.fetchone()['id']
+                    bump_data_version(cur, current_user)
 
                 conn.commit()
+        mood_catalog.remember(resolved)
 
+        if user_mood_id:
+            palette_cache.invalidate(current_user)
+            invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
         return jsonify({
             "id": mood_id,
             "name": mood_name,
@@ -289,10 +637,74 @@ def moods():
             "user_mood_id": user_mood_id
         }), 201 if is_new else 200
 
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error managing mood: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/moods/palette', methods=['GET', 'PUT'])
+@jwt_required()
+@conditional_get
+def palette():
+    current_user = get_jwt_identity()
+
+    if request.method == 'GET':
+        try:
+            with get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    user_palette = palette_cache.get(cur, current_user, g.get('data_version'))
+            return jsonify({"palette": user_palette})
+        except PoolError:
+            raise
+        except Exception as e:
+            app.logger.error(f"Error fetching palette: {str(e)}")
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+    # PUT: upsert every {name, color} in one transaction; moods left out are kept as they are
+    data = request.json or {}
+    items = data.get('palette')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "palette must be a non-empty list of {name, color}"}), 400
+    if len(items) > PALETTE_MAX:
+        return jsonify({"error": f"At most {PALETTE_MAX} moods per request"}), 400
+
+    colors = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('name'), str) or not isinstance(item.get('color'), str):
+            return jsonify({"error": "Each palette item needs a name and a color"}), 400
+        if not item['name'] or len(item['name']) > 50 or not item['color'] or len(item['color']) > 50:
+            return jsonify({"error": "Mood names and colors must be 1-50 characters"}), 400
+        # Later items win, as they would if sent one by one
+        colors[item['name']] = item['color']
+
+    names = list(colors)
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                resolved = mood_catalog.resolve(cur, names)
+                cur.execute("""
+                    INSERT INTO user_moods (user_id, mood_id, color)
+                    SELECT %s, mood_id, color FROM unnest(%s::int[], %s::text[]) AS palette(mood_id, color)
+                    ON CONFLICT (user_id, mood_id) DO UPDATE SET color = EXCLUDED.color
+                """, (current_user, [resolved[name]['id'] for name in names], [colors[name] for name in names]))
+                bump_data_version(cur, current_user)
+                user_palette = load_palette(cur, current_user)
+                conn.commit()
+        mood_catalog.remember(resolved)
+
+        palette_cache.invalidate(current_user)
+        invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
+        return jsonify({
+            "palette": user_palette,
+            "created": sorted(name for name in names if resolved[name]['is_new'])
+        }), 200
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error updating palette: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
 @app.route('/api/notes', methods=['POST'])
 @jwt_required()
 def create_note():
@@ -306,6 +718,7 @@ def create_note():
     try:
         with get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                lock_user(cur, current_user)
                 cur.execute("INSERT INTO notes (entry_id, user_id, date, text) VALUES (%s, %s, %s, %s) RETURNING id", (
                     data['entry_id'],
                     current_user,
@@ -313,15 +726,62 @@ def create_note():
                     data['text']
                 ))
                 new_note_id = cur.fetchone()['id']
+                bump_data_version(cur, current_user)
                 conn.commit()
 
+        invalidate_cached(current_user, 'notes', entry_id=data['entry_id'])
         return jsonify({"note_id": new_note_id})
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error creating note: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/batch', methods=['POST'])
+@jwt_required()
+def batch_write():
+    current_user = get_jwt_identity()
+    operations = (request.json or {}).get('operations')
+
+    try:
+        validate_operations(operations, BATCH_MAX_OPERATIONS)
+    except BatchError as e:
+        return jsonify({"error": str(e), "index": e.index}), 400
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                try:
+                    results, applied = apply_batch(cur, current_user, operations, IDEMPOTENCY_KEY_TTL_DAYS)
+                    if applied:
+                        bump_data_version(cur, current_user)
+                    conn.commit()
+                except BatchError as e:
+                    conn.rollback()
+                    return jsonify({"error": str(e), "index": e.index}), e.status
+                except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+                    conn.rollback()
+                    return jsonify({"error": f"Invalid operation data: {str(e)}"}), 400
+
+        if applied & {'upsert_entry', 'delete_entry'}:
+            invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
+        if applied:
+            invalidate_cached(current_user, 'notes')
+        return jsonify({
+            "results": results,
+            "applied": sum(1 for result in results if result['status'] == 'applied'),
+            "replayed": sum(1 for result in results if result['status'] == 'replayed')
+        })
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error applying batch: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
 @app.route('/api/notes/<entry_id>', methods=['GET'])
 @jwt_required()
+@conditional_get
+@cached_response('notes')
 def get_notes_by_entry_id(entry_id):
     current_user = get_jwt_identity()
 
@@ -337,16 +797,130 @@ def get_notes_by_entry_id(entry_id):
                 notes = cur.fetchall()
         
         return jsonify(notes)
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching notes: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/notes/batch', methods=['GET'])
+@jwt_required()
+@conditional_get
+def get_notes_batch():
+    current_user = get_jwt_identity()
+    entry_ids = [entry_id for raw in request.args.getlist('entryIds') for entry_id in raw.split(',') if entry_id]
+    start_date = request.args.get('startDate')
+    end_date = request.args.get('endDate')
+
+    if not entry_ids and not all([start_date, end_date]):
+        return jsonify({"error": "Provide entryIds or startDate and endDate"}), 400
+
+    if len(entry_ids) > NOTES_BATCH_MAX:
+        return jsonify({"error": f"At most {NOTES_BATCH_MAX} entry ids per request"}), 400
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if not entry_ids:
+                    cur.execute("""
+                        SELECT id FROM entries
+                        WHERE user_id = %s AND date >= %s AND date <= %s
+                        ORDER BY date, id
+                        LIMIT %s
+                    """, (current_user, start_date, end_date, NOTES_BATCH_MAX + 1))
+                    entry_ids = [row['id'] for row in cur.fetchall()]
+                    if len(entry_ids) > NOTES_BATCH_MAX:
+                        return jsonify({"error": f"Date range covers more than {NOTES_BATCH_MAX} entries"}), 400
+
+                cur.execute("""
+                    SELECT id, entry_id, user_id, date, text
+                    FROM notes
+                    WHERE entry_id = ANY(%s) AND user_id = %s
+                    ORDER BY entry_id, date DESC
+                """, (entry_ids, current_user))
+                notes = cur.fetchall()
+
+        grouped = {entry_id: [] for entry_id in entry_ids}
+        for note in notes:
+            grouped.setdefault(note['entry_id'], []).append(note)
+
+        return jsonify(grouped)
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching notes batch: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/api/months/<int:year>/<int:month>', methods=['GET'])
+@jwt_required()
+@conditional_get
+def month_bundle(year, month):
+    current_user = get_jwt_identity()
+
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        return jsonify({"error": "Invalid month"}), 400
+
+    # monthrange keeps December 9999 in range, where the first of the next month is not
+    start_date = date(year, month, 1)
+    end_date = date(year, month, calendar.monthrange(year, month)[1])
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                user_palette = palette_cache.get(cur, current_user, g.get('data_version'))
+
+                cur.execute("""
+                    SELECT id, date, user_mood_id, title, image_path, image_variants, entry_text
+                    FROM entries
+                    WHERE user_id = %s AND date >= %s AND date <= %s
+                    ORDER BY date, id
+                """, (current_user, start_date, end_date))
+                month_entries = cur.fetchall()
+
+                notes_by_entry = {entry['id']: [] for entry in month_entries}
+                if notes_by_entry:
+                    cur.execute("""
+                        SELECT id, entry_id, date, text
+                        FROM notes
+                        WHERE entry_id = ANY(%s) AND user_id = %s
+                        ORDER BY entry_id, date DESC
+                    """, (list(notes_by_entry), current_user))
+                    for note in cur.fetchall():
+                        notes_by_entry[note.pop('entry_id')].append(note)
+
+        for entry in month_entries:
+            entry['notes'] = notes_by_entry[entry['id']]
+
+        return jsonify({
+            "year": year,
+            "month": month,
+            "palette": user_palette,
+            "entries": month_entries
+        })
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching month bundle: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
 @app.route('/api/users', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
 def manage_user():
     current_user = get_jwt_identity()
 
     if request.method == 'GET':
+        claims = get_jwt()
+        if 'username' in claims:
+            # Answered from the token alone; the ETag changes whenever a new generation is issued
+            etag = hashlib.sha1(f"{current_user}:{claims['gen']}:{claims['username']}".encode('utf-8')).hexdigest()[:16]
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = jsonify({"id": current_user, "username": claims['username']})
+                response.headers['Cache-Control'] = 'private, no-cache'
+            response.set_etag(etag)
+            return response
+
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -357,6 +931,8 @@ def manage_user():
                 return jsonify({"error": "User not found"}), 404
             
             return jsonify(user)
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error fetching user: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -366,18 +942,35 @@ def manage_user():
         if 'username' not in data and 'password' not in data:
             return jsonify({"error": "No fields to update"}), 400
 
+        if 'password' in data and len(data['password']) < 8:
+            return jsonify({"error": "Password must be at least 8 characters long"}), 400
+
         try:
+            # Hash before checking out a connection so the pool isn't held for the bcrypt round
+            hashed_password = password_hasher.hash(data['password']) if 'password' in data else None
+
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     if 'username' in data:
                         cur.execute("UPDATE users SET username = %s WHERE id = %s", (data['username'], current_user))
-                    if 'password' in data:
-                        if len(data['password']) < 8:
-                            return jsonify({"error": "Password must be at least 8 characters long"}), 400
-                        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+                    if hashed_password:
                         cur.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, current_user))
+                    bump_data_version(cur, current_user)
+                    # Revoke tokens carrying the old username or issued under the old password
+                    cur.execute("""
+                        UPDATE users SET token_generation = token_generation + 1
+                        WHERE id = %s
+                        RETURNING username, token_generation
+                    """, (current_user,))
+                    user = cur.fetchone()
                     conn.commit()
-            return jsonify({"message": "User updated successfully"})
+            token_generations.set(current_user, user['token_generation'])
+            return jsonify({
+                "message": "User updated successfully",
+                "access_token": issue_access_token(current_user, user['username'], user['token_generation'])
+            })
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error updating user: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -388,13 +981,19 @@ def manage_user():
                     with conn.cursor(cursor_factory=RealDictCursor) as cur:
                         cur.execute("DELETE FROM users WHERE id = %s", (current_user,))
                         conn.commit()
+                        token_generations.set(current_user, DELETED)
+                        palette_cache.invalidate(current_user)
+                        invalidate_cached(current_user)
                         return jsonify({"message": "User deleted successfully"})
+            except PoolError:
+                raise
             except Exception as e:
                 app.logger.error(f"Error deleting user: {str(e)}")
                 return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app.route('/api/entries/<entry_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@conditional_get
 def manage_entry(entry_id):
     current_user = get_jwt_identity()
 
@@ -405,8 +1004,8 @@ def manage_entry(entry_id):
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("""
-                        SELECT entries.*, user_moods.color AS mood_color, moods.name AS mood_name
+                    cur.execute(f"""
+                        SELECT {ENTRY_COLUMNS}, user_moods.color AS mood_color, moods.name AS mood_name
                         FROM entries
                         LEFT JOIN user_moods ON entries.user_mood_id = user_moods.id
                         LEFT JOIN moods ON user_moods.mood_id = moods.id
@@ -418,6 +1017,8 @@ def manage_entry(entry_id):
                 return jsonify({"error": "Entry not found"}), 404
             
             return jsonify(entry)
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error fetching entry: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -430,30 +1031,46 @@ def manage_entry(entry_id):
 
         try:
             image_path = None
+            image_variants = None
             if 'image' in request.files:
                 file = request.files['image']
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    unique_filename = f"{uuid.uuid4()}_{filename}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                    file.save(file_path)
+                if file and allowed_file(secure_filename(file.filename)):
+                    unique_filename, image_variants = save_image(file)
                     image_path = f"/static/uploads/{unique_filename}"
 
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    lock_user(cur, current_user)
                     cur.execute("""
                         UPDATE entries
-                        SET date = %s, user_mood_id = %s, title = %s, entry_text = %s, image_path = COALESCE(%s, image_path)
-                        WHERE id = %s AND user_id = %s
-                        RETURNING id
-                    """, (data['date'], data['user_mood_id'], data['title'], data['entry_text'], image_path, entry_id, current_user))
+                        SET date = %s, user_mood_id = %s, title = %s, entry_text = %s,
+                            image_path = COALESCE(%s, entries.image_path),
+                            image_variants = COALESCE(%s, entries.image_variants)
+                        FROM (
+                            SELECT id, date, user_mood_id FROM entries
+                            WHERE id = %s AND user_id = %s
+                            FOR UPDATE
+                        ) AS previous
+                        WHERE entries.id = previous.id
+                        RETURNING entries.id, entries.date, entries.user_mood_id,
+                            previous.date AS previous_date, previous.user_mood_id AS previous_user_mood_id
+                    """, (data['date'], data['user_mood_id'], data['title'], data['entry_text'], image_path,
+                          Json(image_variants) if image_variants else None, entry_id, current_user))
                     updated_entry = cur.fetchone()
+                    if updated_entry:
+                        record_entry_change(cur, current_user,
+                                            old=(updated_entry['previous_date'], updated_entry['previous_user_mood_id']),
+                                            new=(updated_entry['date'], updated_entry['user_mood_id']))
+                        bump_data_version(cur, current_user)
                     conn.commit()
 
             if not updated_entry:
                 return jsonify({"error": "Entry not found or you don't have permission to update it"}), 404
 
+            invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
             return jsonify({"message": "Entry updated successfully", "entry_id": updated_entry['id']})
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error updating entry: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -462,20 +1079,29 @@ def manage_entry(entry_id):
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("DELETE FROM entries WHERE id = %s AND user_id = %s RETURNING id", (entry_id, current_user))
+                    lock_user(cur, current_user)
+                    cur.execute("DELETE FROM entries WHERE id = %s AND user_id = %s RETURNING id, date, user_mood_id", (entry_id, current_user))
                     deleted_entry = cur.fetchone()
+                    if deleted_entry:
+                        record_entry_change(cur, current_user, old=(deleted_entry['date'], deleted_entry['user_mood_id']))
+                        bump_data_version(cur, current_user)
                     conn.commit()
 
             if not deleted_entry:
                 return jsonify({"error": "Entry not found or you don't have permission to delete it"}), 404
 
+            invalidate_cached(current_user, 'entries', 'chart_data', 'insights')
+            invalidate_cached(current_user, 'notes', entry_id=entry_id)
             return jsonify({"message": "Entry deleted successfully"})
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error deleting entry: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app.route('/api/notes/<note_id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
+@conditional_get
 def manage_note(note_id):
     current_user = get_jwt_identity()
 
@@ -486,13 +1112,15 @@ def manage_note(note_id):
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM notes WHERE id = %s AND user_id = %s", (note_id, current_user))
+                    cur.execute("SELECT id, entry_id, user_id, date, text FROM notes WHERE id = %s AND user_id = %s", (note_id, current_user))
                     note = cur.fetchone()
             
             if not note:
                 return jsonify({"error": "Note not found"}), 404
             
             return jsonify(note)
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error fetching note: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -505,19 +1133,25 @@ def manage_note(note_id):
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    lock_user(cur, current_user)
                     cur.execute("""
                         UPDATE notes
                         SET text = %s, date = CURRENT_TIMESTAMP
                         WHERE id = %s AND user_id = %s
-                        RETURNING id
+                        RETURNING id, entry_id
                     """, (data['text'], note_id, current_user))
                     updated_note = cur.fetchone()
+                    if updated_note:
+                        bump_data_version(cur, current_user)
                     conn.commit()
 
             if not updated_note:
                 return jsonify({"error": "Note not found or you don't have permission to update it"}), 404
 
+            invalidate_cached(current_user, 'notes', entry_id=updated_note['entry_id'])
             return jsonify({"message": "Note updated successfully", "note_id": updated_note['id']})
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error updating note: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
@@ -526,43 +1160,326 @@ def manage_note(note_id):
         try:
             with get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("DELETE FROM notes WHERE id = %s AND user_id = %s RETURNING id", (note_id, current_user))
+                    lock_user(cur, current_user)
+                    cur.execute("DELETE FROM notes WHERE id = %s AND user_id = %s RETURNING id, entry_id", (note_id, current_user))
                     deleted_note = cur.fetchone()
+                    if deleted_note:
+                        bump_data_version(cur, current_user)
                     conn.commit()
 
             if not deleted_note:
                 return jsonify({"error": "Note not found or you don't have permission to delete it"}), 404
 
+            invalidate_cached(current_user, 'notes', entry_id=deleted_note['entry_id'])
             return jsonify({"message": "Note deleted successfully"})
+        except PoolError:
+            raise
         except Exception as e:
             app.logger.error(f"Error deleting note: {str(e)}")
             return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app.route('/api/chart-data/', methods=['GET', 'OPTIONS'])
 @jwt_required()
+@conditional_get
+@cached_response('chart_data')
 def chart_data():
     current_user = get_jwt_identity()
-    
+    start_date = request.args.get('startDate')
+    end_date = request.args.get('endDate')
+    bucket = request.args.get('bucket', 'day')
+
+    if bucket not in BUCKETS:
+        return jsonify({"error": "bucket must be one of: day, week, month"}), 400
+
     try:
         with get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
-                    SELECT entries.date, moods.name AS mood_name,
+                    SELECT mood_rollups.bucket_start AS date, moods.name AS mood_name,
                         user_moods.color AS mood_color,
-                    COUNT(*) AS entry_count
-                    FROM entries
-                    JOIN user_moods ON entries.user_mood_id = user_moods.id
+                    mood_rollups.entry_count
+                    FROM mood_rollups
+                    JOIN user_moods ON mood_rollups.user_mood_id = user_moods.id
                     JOIN moods ON user_moods.mood_id = moods.id
-                    WHERE entries.user_id = %s
-                    GROUP BY entries.date, moods.name, user_moods.color
-                    ORDER BY entries.date ASC
-                    """, (current_user,))
+                    WHERE mood_rollups.user_id = %(user_id)s
+                    AND mood_rollups.bucket = %(bucket)s
+                    AND (%(start)s::date IS NULL OR mood_rollups.bucket_start >= date_trunc(%(bucket)s, %(start)s::date)::date)
+                    AND (%(end)s::date IS NULL OR mood_rollups.bucket_start <= %(end)s::date)
+                    ORDER BY mood_rollups.bucket_start ASC
+                    """, {'user_id': current_user, 'bucket': bucket, 'start': start_date, 'end': end_date})
                 chart_data = cur.fetchall()
         
         return jsonify(chart_data)
+    except PoolError:
+        raise
     except Exception as e:
         app.logger.error(f"Error fetching chart data: {str(e)}")
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+@app.route('/api/insights', methods=['GET'])
+@jwt_required()
+@conditional_get
+@cached_response('insights')
+def insights():
+    current_user = get_jwt_identity()
+
+    try:
+        # Clients send their own calendar date as ?today=, so "current streak" follows the user's
+        # day rather than the server's, and the cached response and ETag roll over with it
+        today = date.fromisoformat(request.args['today']) if request.args.get('today') else None
+    except ValueError:
+        return jsonify({"error": "today must be YYYY-MM-DD"}), 400
+    try:
+        start_date, end_date = parse_range(request.args.get('startDate'), request.args.get('endDate'), today)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                result = mood_insights(cur, current_user, start_date, end_date,
+                                       palette_cache.get(cur, current_user, g.get('data_version')), today)
+
+        return jsonify(result)
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error computing insights: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/api/search', methods=['GET'])
+@jwt_required()
+@conditional_get
+def search():
+    current_user = get_jwt_identity()
+    query = (request.args.get('q') or '').strip()
+
+    if not query:
+        return jsonify({"error": "Missing search query"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'), SEARCH_PAGE_DEFAULT, SEARCH_PAGE_MAX)
+        after = decode_cursor(request.args['cursor'], 2, (float, str)) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        mood_id = int(request.args['moodId']) if request.args.get('moodId') else None
+    except ValueError:
+        return jsonify({"error": "moodId must be an integer"}), 400
+    try:
+        for name in ('startDate', 'endDate'):
+            if request.args.get(name):
+                date.fromisoformat(request.args[name])
+    except ValueError:
+        return jsonify({"error": "startDate and endDate must be YYYY-MM-DD"}), 400
+
+    params = {
+        'user_id': current_user,
+        'query': query,
+        'start': request.args.get('startDate'),
+        'end': request.args.get('endDate'),
+        'mood_id': mood_id,
+        'after_rank': after[0] if after else None,
+        'after_id': after[1] if after else None,
+        'limit': limit + 1,
+        'headline_options': SEARCH_HEADLINE_OPTIONS,
+    }
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                # Rank every match from the GIN indexes, page on (rank, id), and only build
+                # highlighted snippets for the rows that make it onto the page. The @@ tests sit
+                # directly on entries/notes with the tsquery inline, so each side can use its index.
+                cur.execute(f"""
+                    WITH matches AS (
+                        SELECT entries.id, ts_rank(entries.search_vector, {SEARCH_TSQUERY}) AS rank
+                        FROM entries
+                        WHERE entries.search_vector @@ {SEARCH_TSQUERY}
+                        AND {SEARCH_SCOPE}
+                        UNION ALL
+                        SELECT notes.entry_id, ts_rank(notes.search_vector, {SEARCH_TSQUERY}) * 0.5
+                        FROM notes
+                        JOIN entries ON notes.entry_id = entries.id
+                        WHERE notes.search_vector @@ {SEARCH_TSQUERY}
+                        AND notes.user_id = %(user_id)s
+                        AND {SEARCH_SCOPE}
+                    ),
+                    page AS (
+                        SELECT id, max(rank)::float8 AS rank
+                        FROM matches
+                        GROUP BY id
+                        HAVING %(after_rank)s::float8 IS NULL
+                            OR (max(rank)::float8, id) < (%(after_rank)s::float8, %(after_id)s)
+                        ORDER BY rank DESC, id DESC
+                        LIMIT %(limit)s
+                    )
+                    SELECT entries.id, entries.date, entries.title, entries.user_mood_id,
+                        entries.image_path IS NOT NULL AS has_image, page.rank,
+                        ts_headline('english', entries.entry_text, q.query,
+                                    %(headline_options)s || ', MaxFragments=2') AS snippet,
+                        (
+                            SELECT ts_headline('english', notes.text, q.query,
+                                               %(headline_options)s || ', MaxFragments=1')
+                            FROM notes
+                            WHERE notes.entry_id = entries.id AND notes.user_id = %(user_id)s
+                            AND notes.search_vector @@ q.query
+                            ORDER BY ts_rank(notes.search_vector, q.query) DESC
+                            LIMIT 1
+                        ) AS note_snippet
+                    FROM page
+                    JOIN entries ON entries.id = page.id,
+                    LATERAL (SELECT {SEARCH_TSQUERY} AS query) q
+                    ORDER BY page.rank DESC, page.id DESC
+                """, params)
+                results = cur.fetchall()
+
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = encode_cursor(results[-1]['rank'], results[-1]['id'])
+        for result in results:
+            result['snippet'] = highlight_snippet(result['snippet'])
+            result['note_snippet'] = highlight_snippet(result['note_snippet'])
+
+        return jsonify({"results": results, "next": next_cursor})
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error searching entries: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/api/import', methods=['POST'])
+@jwt_required()
+def import_entries():
+    current_user = get_jwt_identity()
+    file = request.files.get('file')
+
+    if not file:
+        return jsonify({"error": "No file part"}), 400
+
+    fmt = detect_format(file.filename, request.args.get('format'))
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    try:
+        stream = io.TextIOWrapper(file.stream, encoding='utf-8', newline='')
+        with get_connection() as conn:
+            report = import_journal(conn, current_user, stream, fmt)
+
+        invalidate_cached(current_user)
+        return jsonify(report)
+    except (JournalImportError, UnicodeDecodeError, psycopg2.DataError) as e:
+        return jsonify({"error": f"Invalid import file: {str(e)}"}), 400
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error importing entries: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/api/sync', methods=['GET'])
+@jwt_required()
+@conditional_get
+def sync():
+    current_user = get_jwt_identity()
+
+    try:
+        since = int(request.args.get('since', 0))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "since must be a non-negative integer"}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), SYNC_PAGE_DEFAULT, SYNC_PAGE_MAX)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                try:
+                    changes, last_seq, has_more = fetch_changes(cur, current_user, since, limit)
+                except SyncCursorExpired as e:
+                    return jsonify({"error": str(e), "min_seq": e.min_seq}), 410
+            conn.rollback()
+
+        # Clients store `seq` and pass it back as `since`; apply items in seq order, as a
+        # row can be deleted and recreated (entries reuse <user>_<date> ids) within one page
+        return jsonify({**changes, "since": since, "seq": last_seq, "has_more": has_more})
+    except PoolError:
+        raise
+    except Exception as e:
+        app.logger.error(f"Error fetching changes: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@app.route('/api/export', methods=['GET'])
+@jwt_required()
+def export_account():
+    current_user = get_jwt_identity()
+    fmt = request.args.get('format', 'ndjson')
+    include_images = request.args.get('images', '1') not in ('0', 'false')
+    upload_folder = app.config['UPLOAD_FOLDER']
+
+    if fmt not in ('ndjson', 'zip'):
+        return jsonify({"error": "format must be ndjson or zip"}), 400
+
+    # Checked out up front like stream_entries(), so an exhausted pool is a 503
+    resources = ExitStack()
+    conn = resources.enter_context(get_connection())
+
+    def generate():
+        try:
+            if fmt == 'zip':
+                yield from exporter.stream_zip(conn, current_user, upload_folder, include_images)
+            else:
+                yield from exporter.stream_ndjson(conn, current_user)
+        except Exception as e:
+            app.logger.error(f"Error exporting account: {str(e)}")
+            raise
+        finally:
+            conn.rollback()
+
+    filename = f"ebb-export-{date.today().isoformat()}.{'zip' if fmt == 'zip' else 'ndjson'}"
+    response = Response(stream_with_context(generate()),
+                        mimetype='application/zip' if fmt == 'zip' else 'application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.call_on_close(resources.close)
+    return response
+
+@app.route('/api/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/pool/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def pool_stats():
+    return jsonify(connection_pool.stats())
+
+@app.route('/api/admin/queries', methods=['GET', 'DELETE'])
+@jwt_required()
+@admin_required
+def query_stats():
+    if request.method == 'DELETE':
+        query_tracer.reset()
+        return jsonify({"message": "Query stats reset"}), 200
+
+    order_by = request.args.get('order', 'total_ms')
+    if order_by not in QUERY_STATS_ORDERS:
+        return jsonify({"error": f"order must be one of: {', '.join(QUERY_STATS_ORDERS)}"}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), 50, 1000)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "threshold_ms": SLOW_QUERY_MS,
+        "explain_sample_rate": SLOW_QUERY_EXPLAIN_SAMPLE,
+        "queries": query_tracer.stats(limit=limit, order_by=order_by),
+        "plans": query_tracer.plans(),
+    })
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,250 @@
+import json
+from datetime import date
+
+from rollups import record_entry_changes
+from versions import lock_user
+
+# Operations are applied grouped by kind in this order, so one batch can create an
+# entry and attach notes to it, and deletes land after any edits to the same rows.
+OPERATION_ORDER = ('upsert_entry', 'create_note', 'update_note', 'delete_note', 'delete_entry')
+
+REQUIRED_FIELDS = {
+    'upsert_entry': ('date', 'user_mood_id', 'title', 'entry_text'),
+    'create_note': ('entry_id', 'date', 'text'),
+    'update_note': ('note_id', 'text'),
+    'delete_note': ('note_id',),
+    'delete_entry': ('entry_id',),
+}
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+TITLE_MAX_LENGTH = 255
+
+def _is_int(value):
+    # bool is an int subclass, but `true` is never a valid id
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _is_entry_date(value):
+    # Exactly YYYY-MM-DD: the date becomes part of the <user>_<date> entry id
+    if not isinstance(value, str):
+        return False
+    try:
+        return date.fromisoformat(value).isoformat() == value
+    except ValueError:
+        return False
+
+def _is_note_date(value):
+    # notes.date is a date column; a timestamp string is accepted and truncated by the database
+    if not isinstance(value, str):
+        return False
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+# field -> (check, error message) for every required field; `date` depends on the op
+FIELD_CHECKS = {
+    'user_mood_id': (lambda v: v is None or _is_int(v), "user_mood_id must be an integer or null"),
+    'title': (lambda v: isinstance(v, str) and 0 < len(v) <= TITLE_MAX_LENGTH,
+              f"title must be a string of 1-{TITLE_MAX_LENGTH} characters"),
+    'entry_text': (lambda v: isinstance(v, str), "entry_text must be a string"),
+    'entry_id': (lambda v: isinstance(v, str) and bool(v), "entry_id must be a non-empty string"),
+    'text': (lambda v: isinstance(v, str), "text must be a string"),
+    'note_id': (lambda v: _is_int(v) and v > 0, "note_id must be a positive integer"),
+}
+DATE_CHECKS = {
+    'upsert_entry': (_is_entry_date, "date must be a YYYY-MM-DD string"),
+    'create_note': (_is_note_date, "date must be an ISO date string"),
+}
+
+class BatchError(ValueError):
+    def __init__(self, index, message, status=400):
+        super().__init__(message)
+        self.index = index
+        self.status = status
+
+def validate_operations(operations, max_operations):
+    if not isinstance(operations, list) or not operations:
+        raise BatchError(None, "operations must be a non-empty list")
+    if len(operations) > max_operations:
+        raise BatchError(None, f"At most {max_operations} operations per batch")
+
+    keys = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in REQUIRED_FIELDS:
+            raise BatchError(index, f"op must be one of: {', '.join(OPERATION_ORDER)}")
+        if not all(field in operation for field in REQUIRED_FIELDS[operation['op']]):
+            raise BatchError(index, "Missing required fields")
+        for field in REQUIRED_FIELDS[operation['op']]:
+            check, message = DATE_CHECKS[operation['op']] if field == 'date' else FIELD_CHECKS[field]
+            if not check(operation[field]):
+                raise BatchError(index, message)
+
+        key = operation.get('key')
+        if key is not None:
+            if not isinstance(key, str) or not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                raise BatchError(index, f"key must be a string of 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+            if key in keys:
+                raise BatchError(index, "Duplicate idempotency key in batch")
+            keys.add(key)
+
+def _claim_keys(cur, user_id, operations, results, key_ttl_days):
+    """Claim every key in the batch; keys already claimed by an earlier request replay their stored result.
+
+    A concurrent request carrying the same key blocks on the insert until the first
+    one commits or rolls back, so each key is applied at most once.
+    """
+    keys = [operation['key'] for operation in operations if operation.get('key')]
+    if not keys:
+        return
+    # Expired keys are pruned here, per user, rather than by a separate sweeper
+    cur.execute("""
+        DELETE FROM idempotency_keys
+        WHERE user_id = %s AND created_at < now() - make_interval(days => %s)
+    """, (user_id, key_ttl_days))
+    cur.execute("""
+        INSERT INTO idempotency_keys (user_id, key)
+        SELECT %s, unnest(%s::text[])
+        ON CONFLICT (user_id, key) DO NOTHING
+        RETURNING key
+    """, (user_id, keys))
+    claimed = {row['key'] for row in cur.fetchall()}
+
+    replayed = [key for key in keys if key not in claimed]
+    if not replayed:
+        return
+    cur.execute("SELECT key, result FROM idempotency_keys WHERE user_id = %s AND key = ANY(%s)", (user_id, replayed))
+    stored = {row['key']: row['result'] for row in cur.fetchall()}
+    for index, operation in enumerate(operations):
+        if operation.get('key') in stored:
+            results[index] = {**(stored[operation['key']] or {}), "status": "replayed"}
+
+def _upsert_entries(cur, user_id, operations, indexes, results):
+    # Entry ids follow POST /api/entries: one entry per user and date, the last edit in the batch wins
+    latest = {}
+    for index in indexes:
+        latest[f"{user_id}_{operations[index]['date']}"] = index
+    ids = list(latest)
+    rows = [operations[latest[entry_id]] for entry_id in ids]
+
+    cur.execute("SELECT id, date, user_mood_id FROM entries WHERE id = ANY(%s) FOR UPDATE", (ids,))
+    previous = {row['id']: (row['date'], row['user_mood_id']) for row in cur.fetchall()}
+
+    cur.execute("""
+        INSERT INTO entries (id, user_id, date, user_mood_id, title, entry_text)
+        SELECT e.id, %s, e.date, e.user_mood_id, e.title, e.entry_text
+        FROM unnest(%s::text[], %s::date[], %s::int[], %s::text[], %s::text[])
+            AS e(id, date, user_mood_id, title, entry_text)
+        ON CONFLICT (id) DO UPDATE
+        SET user_mood_id = EXCLUDED.user_mood_id,
+            title = EXCLUDED.title,
+            entry_text = EXCLUDED.entry_text
+        RETURNING id, date, user_mood_id
+    """, (user_id, ids, [row['date'] for row in rows], [row['user_mood_id'] for row in rows],
+          [row['title'] for row in rows], [row['entry_text'] for row in rows]))
+    saved = {row['id']: (row['date'], row['user_mood_id']) for row in cur.fetchall()}
+
+    record_entry_changes(cur, user_id, [(previous.get(entry_id), saved[entry_id]) for entry_id in ids])
+    for index in indexes:
+        results[index] = {"entry_id": f"{user_id}_{operations[index]['date']}"}
+
+def _create_notes(cur, user_id, operations, indexes, results):
+    entry_ids = sorted({operations[index]['entry_id'] for index in indexes})
+    cur.execute("SELECT id FROM entries WHERE user_id = %s AND id = ANY(%s)", (user_id, entry_ids))
+    owned = {row['id'] for row in cur.fetchall()}
+    for index in indexes:
+        if operations[index]['entry_id'] not in owned:
+            raise BatchError(index, "Entry not found or you don't have permission to add notes to it", 404)
+
+    # Ids are drawn up front so each new note can be matched back to its operation
+    cur.execute("SELECT nextval(pg_get_serial_sequence('notes', 'id')) AS id FROM generate_series(1, %s)", (len(indexes),))
+    note_ids = [row['id'] for row in cur.fetchall()]
+    cur.execute("""
+        INSERT INTO notes (id, entry_id, user_id, date, text)
+        SELECT n.id, n.entry_id, %s, n.date, n.text
+        FROM unnest(%s::int[], %s::text[], %s::date[], %s::text[]) AS n(id, entry_id, date, text)
+    """, (user_id, note_ids, [operations[index]['entry_id'] for index in indexes],
+          [operations[index]['date'] for index in indexes], [operations[index]['text'] for index in indexes]))
+    for note_id, index in zip(note_ids, indexes):
+        results[index] = {"note_id": note_id, "entry_id": operations[index]['entry_id']}
+
+def _update_notes(cur, user_id, operations, indexes, results):
+    latest = {}
+    for index in indexes:
+        latest[operations[index]['note_id']] = index
+    note_ids = list(latest)
+    cur.execute("""
+        UPDATE notes
+        SET text = u.text, date = CURRENT_TIMESTAMP
+        FROM unnest(%s::int[], %s::text[]) AS u(id, text)
+        WHERE notes.id = u.id AND notes.user_id = %s
+        RETURNING notes.id, notes.entry_id
+    """, (note_ids, [operations[latest[note_id]]['text'] for note_id in note_ids], user_id))
+    _match_notes(cur.fetchall(), operations, indexes, results, "update")
+
+def _delete_notes(cur, user_id, operations, indexes, results):
+    note_ids = sorted({operations[index]['note_id'] for index in indexes})
+    cur.execute("DELETE FROM notes WHERE id = ANY(%s) AND user_id = %s RETURNING id, entry_id", (note_ids, user_id))
+    _match_notes(cur.fetchall(), operations, indexes, results, "delete")
+
+def _match_notes(rows, operations, indexes, results, action):
+    entry_ids = {row['id']: row['entry_id'] for row in rows}
+    for index in indexes:
+        note_id = operations[index]['note_id']
+        if note_id not in entry_ids:
+            raise BatchError(index, f"Note not found or you don't have permission to {action} it", 404)
+        results[index] = {"note_id": note_id, "entry_id": entry_ids[note_id]}
+
+def _delete_entries(cur, user_id, operations, indexes, results):
+    entry_ids = sorted({operations[index]['entry_id'] for index in indexes})
+    cur.execute("DELETE FROM entries WHERE id = ANY(%s) AND user_id = %s RETURNING id, date, user_mood_id",
+                (entry_ids, user_id))
+    deleted = {row['id']: (row['date'], row['user_mood_id']) for row in cur.fetchall()}
+    for index in indexes:
+        if operations[index]['entry_id'] not in deleted:
+            raise BatchError(index, "Entry not found or you don't have permission to delete it", 404)
+        results[index] = {"entry_id": operations[index]['entry_id']}
+    record_entry_changes(cur, user_id, [(old, None) for old in deleted.values()])
+
+APPLIERS = {
+    'upsert_entry': _upsert_entries,
+    'create_note': _create_notes,
+    'update_note': _update_notes,
+    'delete_note': _delete_notes,
+    'delete_entry': _delete_entries,
+}
+
+def apply_batch(cur, user_id, operations, key_ttl_days):
+    """Apply validated operations in the caller's transaction, one multi-row statement per kind.
+
+    Returns (results, applied_kinds): a result per operation, in input order, and the set
+    of operation kinds that actually ran. Raises BatchError on the first operation that
+    can't be applied; the caller rolls back, which also releases the claimed keys.
+    """
+    results = [None] * len(operations)
+    # Serializes the user's writers, so the pre-images read below can't miss a concurrent insert
+    lock_user(cur, user_id)
+    _claim_keys(cur, user_id, operations, results, key_ttl_days)
+
+    pending = {}
+    for index, operation in enumerate(operations):
+        if results[index] is None:
+            pending.setdefault(operation['op'], []).append(index)
+    for kind in OPERATION_ORDER:
+        if kind in pending:
+            APPLIERS[kind](cur, user_id, operations, pending[kind], results)
+
+    stored_keys, stored_results = [], []
+    for kind_indexes in pending.values():
+        for index in kind_indexes:
+            results[index]["status"] = "applied"
+            if operations[index].get('key'):
+                stored_keys.append(operations[index]['key'])
+                stored_results.append(json.dumps({k: v for k, v in results[index].items() if k != 'status'}))
+    if stored_keys:
+        cur.execute("""
+            UPDATE idempotency_keys SET result = r.result::jsonb
+            FROM unnest(%s::text[], %s::text[]) AS r(key, result)
+            WHERE idempotency_keys.user_id = %s AND idempotency_keys.key = r.key
+        """, (stored_keys, stored_results, user_id))
+    return results, set(pending)
@@ -0,0 +1,80 @@
+"""Login throughput vs. bcrypt cost and hashing pool size.
+
+Usage: python benchmarks/bench_hashing.py --costs 10 11 12 --workers 1 2 4 --clients 16 --seconds 5
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashing import PasswordHasher, _hash_password
+
+PASSWORD = "correct horse battery staple"
+
+def run(cost, workers, clients, seconds, executor):
+    hasher = PasswordHasher(rounds=cost, workers=workers, executor=executor)
+    stored = _hash_password(PASSWORD, cost)
+    hasher.verify(stored, PASSWORD)  # warm the pool
+
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            hasher.verify(stored, PASSWORD)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    latencies.sort()
+    return {
+        "cost": cost,
+        "workers": workers,
+        "clients": clients,
+        "executor": executor,
+        "logins": len(latencies),
+        "logins_per_sec": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--costs', type=int, nargs='+', default=[10, 11, 12])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--executor', choices=['process', 'thread'], default='process')
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'cost':>4} {'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for cost in args.costs:
+        for workers in sorted(set(args.workers)):
+            result = run(cost, workers, args.clients, args.seconds, args.executor)
+            results.append(result)
+            print(f"{cost:>4} {workers:>7} {result['logins_per_sec']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Serialization and compression cost per 1k entries.
+
+Times Flask's default JSON provider against orjson on synthetic entry rows shaped like
+/api/entries output, then each available codec on the result, buffered and streamed.
+
+Usage: python benchmarks/bench_serialization.py --entries 1000 --words 60 --repeat 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from compression import CODECS, compress_stream
+from pagination import stream_json_array
+from serialization import OrjsonProvider, orjson
+
+WORDS = "today walked felt really quite long day work home friend coffee rain dinner slept early tired calm busy".split()
+
+def make_entries(count, words, seed):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for n in range(count):
+        day = start + timedelta(days=n)
+        digest = f"{rng.getrandbits(256):064x}"
+        has_image = rng.random() < 0.2
+        rows.append({
+            "id": f"1_{day.isoformat()}",
+            "user_id": 1,
+            "date": day,
+            "user_mood_id": rng.randint(1, 10),
+            "title": ' '.join(rng.choice(WORDS) for _ in range(5)).capitalize(),
+            "image_path": f"../../backend/static/uploads/{digest}.jpg" if has_image else None,
+            "image_variants": {"hash": digest, "original": f"{digest}.jpg",
+                               "variants": {v: {"webp": f"{digest}_{v}.webp"} for v in ("thumb", "card", "full")}}
+                              if has_image else None,
+            "entry_text": ' '.join(rng.choice(WORDS) for _ in range(max(1, int(rng.gauss(words, words / 3))))),
+            "mood_color": f"#{rng.randint(0, 0xFFFFFF):06x}",
+            "mood_name": rng.choice(["Happy", "Sad", "Calm", "Tired", "Anxious"]),
+        })
+    return rows
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=60, help="Mean entry length in words")
+    parser.add_argument('--repeat', type=int, default=50, help="Runs per measurement; the best is reported")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="Write results as JSON")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rows = make_entries(args.entries, args.words, args.seed)
+    per_1k = 1000 / args.entries
+    results = {"entries": args.entries, "serializers": {}, "codecs": {}}
+
+    providers = {"flask-default": DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers["orjson"] = OrjsonProvider(app)
+    with app.app_context():
+        for name, provider in providers.items():
+            seconds, body = timed(lambda: provider.response(rows).get_data(), args.repeat)
+            results["serializers"][name] = {"ms_per_1k": seconds * 1000 * per_1k, "bytes": len(body)}
+
+    # Codecs are measured on what the app would send: orjson output when it's installed
+    dumps = providers.get("orjson", providers["flask-default"]).dumps
+    body = dumps(rows).encode('utf-8')
+    for name, (compress, stream_class, level) in CODECS.items():
+        seconds, compressed = timed(lambda: compress(body, level), args.repeat)
+        stream_seconds, streamed = timed(
+            lambda: b''.join(compress_stream(stream_json_array(rows, dumps), stream_class(level))),
+            max(1, args.repeat // 5))
+        results["codecs"][name] = {
+            "level": level,
+            "ms_per_1k": seconds * 1000 * per_1k,
+            "bytes": len(compressed),
+            "ratio": len(body) / len(compressed),
+            "stream_ms_per_1k": stream_seconds * 1000 * per_1k,
+            "stream_bytes": len(streamed),
+        }
+
+    print(f"{'serializer':<16} {'ms/1k':>8} {'bytes':>10}")
+    for name, stats in results["serializers"].items():
+        print(f"{name:<16} {stats['ms_per_1k']:>8.2f} {stats['bytes']:>10}")
+    print()
+    print(f"{'codec':<8} {'level':>5} {'ms/1k':>8} {'bytes':>10} {'ratio':>6} {'stream ms/1k':>13} {'stream bytes':>13}")
+    for name, stats in results["codecs"].items():
+        print(f"{name:<8} {stats['level']:>5} {stats['ms_per_1k']:>8.2f} {stats['bytes']:>10} {stats['ratio']:>6.2f} "
+              f"{stats['stream_ms_per_1k']:>13.2f} {stats['stream_bytes']:>13}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
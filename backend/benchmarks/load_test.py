@@ -0,0 +1,269 @@
+"""API load test and latency benchmark.
+
+Drives a weighted mix of login, month entries, paginated entry listing, notes, entry
+upserts and chart data requests against the app (in-process by default, or a running
+server with --url), using the users created by seed.py. Reports per-endpoint p50/p95/p99, throughput and
+error rate, writes them as JSON, and exits non-zero if a run regresses against a
+saved baseline.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 16 --duration 30 --out results.json
+    python benchmarks/load_test.py --baseline results.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "password123"
+
+# (name, weight) — roughly what the calendar-heavy frontend generates
+MIX = [
+    ("login", 2),
+    ("month_entries", 35),
+    ("entries_page", 10),
+    ("notes", 25),
+    ("upsert_entry", 8),
+    ("chart_data", 25),
+]
+
+class InProcessClient:
+    def __init__(self):
+        from app import app
+        self.client = app.test_client()
+
+    def request(self, method, path, token=None, json_body=None, form=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.open(path, method=method, headers=headers, json=json_body, data=form)
+        return response.status_code, response.get_data()
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, token=None, json_body=None, form=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            boundary = 'loadtestboundary'
+            parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n' for k, v in form.items()]
+            body = (''.join(parts) + f'--{boundary}--\r\n').encode('utf-8')
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+class VirtualUser:
+    def __init__(self, client, username, rng):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.token = None
+        self.palette = []
+        self.entry_ids = []
+        self.page_cursor = None
+
+    def login(self):
+        status, body = self.client.request('POST', '/api/login', json_body={"username": self.username, "password": PASSWORD})
+        if status == 200:
+            self.token = json.loads(body)['access_token']
+        return status
+
+    def month_entries(self):
+        today = date.today()
+        month = self.rng.randint(1, 12)
+        year = today.year if month <= today.month else today.year - 1
+        status, body = self.client.request('GET', f'/api/months/{year}/{month}', token=self.token)
+        if status == 200:
+            bundle = json.loads(body)
+            self.palette = [int(mood_id) for mood_id in bundle['palette']]
+            self.entry_ids = [entry['id'] for entry in bundle['entries']] or self.entry_ids
+        return status
+
+    def entries_page(self):
+        # Walks a year of entries page by page, starting over once the last page is reached
+        today = date.today()
+        params = {'startDate': today.replace(year=today.year - 1, day=1).isoformat(),
+                  'endDate': today.isoformat(), 'limit': 50}
+        if self.page_cursor:
+            params['cursor'] = self.page_cursor
+        status, body = self.client.request('GET', f'/api/entries?{urllib.parse.urlencode(params)}', token=self.token)
+        self.page_cursor = json.loads(body)['next'] if status == 200 else None
+        return status
+
+    def notes(self):
+        if not self.entry_ids:
+            return self.month_entries()
+        entry_id = self.rng.choice(self.entry_ids)
+        return self.client.request('GET', f'/api/notes/{entry_id}', token=self.token)[0]
+
+    def upsert_entry(self):
+        if not self.palette:
+            return self.month_entries()
+        data = {
+            "date": date.today().isoformat(),
+            "user_mood_id": self.rng.choice(self.palette),
+            "title": "Load test entry",
+            "entry_text": "Written by the load test. " * self.rng.randint(1, 20),
+        }
+        return self.client.request('POST', '/api/entries', token=self.token, form={"data": json.dumps(data)})[0]
+
+    def chart_data(self):
+        bucket = self.rng.choice(['day', 'week', 'month'])
+        return self.client.request('GET', f'/api/chart-data/?bucket={bucket}', token=self.token)[0]
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run(make_client, usernames, concurrency, duration, warmup, seed):
+    samples = {name: [] for name, _ in MIX}
+    errors = {name: 0 for name, _ in MIX}
+    lock = threading.Lock()
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    start_barrier = threading.Barrier(concurrency + 1)
+    go = threading.Event()
+    measure_from = [0.0]
+    stop_at = [0.0]
+
+    def worker(index):
+        rng = random.Random(f"{seed}:{index}")
+        try:
+            user = VirtualUser(make_client(), usernames[index % len(usernames)], rng)
+            user.login()
+            user.month_entries()
+        finally:
+            start_barrier.wait()
+        go.wait()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at[0]:
+                break
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = getattr(user, name)()
+            except Exception:
+                status = 599
+            finished = time.perf_counter()
+            if started < measure_from[0]:
+                continue
+            local[name].append(finished - started)
+            if status >= 400:
+                local_errors[name] += 1
+
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    began = time.perf_counter()
+    measure_from[0] = began + warmup
+    stop_at[0] = began + warmup + duration
+    go.set()
+    for thread in threads:
+        thread.join()
+
+    endpoints = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        count = len(latencies)
+        endpoints[name] = {
+            "requests": count,
+            "errors": errors[name],
+            "error_rate": errors[name] / count if count else 0.0,
+            "throughput_rps": count / duration,
+            "p50_ms": percentile(latencies, 50) * 1000 if count else None,
+            "p95_ms": percentile(latencies, 95) * 1000 if count else None,
+            "p99_ms": percentile(latencies, 99) * 1000 if count else None,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "total_requests": total,
+        "throughput_rps": total / duration,
+        "error_rate": sum(e["errors"] for e in endpoints.values()) / total if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+def compare(result, baseline, max_regression, max_error_rate):
+    failures = []
+    if result["error_rate"] > max_error_rate:
+        failures.append(f"error rate {result['error_rate']:.2%} exceeds {max_error_rate:.2%}")
+    for name, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous or not previous.get("p95_ms") or not current.get("p95_ms"):
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {current['p95_ms']:.1f}ms vs baseline {previous['p95_ms']:.1f}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}: {current['throughput_rps']:.1f} req/s vs baseline {previous['throughput_rps']:.1f} req/s")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Benchmark a running server instead of the in-process app")
+    parser.add_argument('--users', default="alice,bob,charlie", help="Comma-separated seeded usernames")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="Write results as JSON")
+    parser.add_argument('--baseline', help="Fail if results regress against this JSON file")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed p95/throughput regression (0.2 = 20%%)")
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    make_client = (lambda: HttpClient(args.url)) if args.url else InProcessClient
+    result = run(make_client, args.users.split(','), args.concurrency, args.duration, args.warmup, args.seed)
+
+    print(f"{'endpoint':<14} {'req':>7} {'req/s':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in result["endpoints"].items():
+        if not stats["requests"]:
+            continue
+        print(f"{name:<14} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} {stats['error_rate'] * 100:>5.1f}% "
+              f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms")
+    print(f"total: {result['total_requests']} requests, {result['throughput_rps']:.1f} req/s, "
+          f"{result['error_rate']:.2%} errors")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(result, json.load(f), args.max_regression, args.max_error_rate)
+        if failures:
+            print("Regressions against baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
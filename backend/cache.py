@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+class CachedResponse:
+    __slots__ = ('body', 'status', 'mimetype', 'expires_at')
+
+    def __init__(self, body, status, mimetype, expires_at):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.expires_at = expires_at
+
+class ResponseCache:
+    """Bounded LRU + TTL cache of serialized GET responses, indexed by user for targeted invalidation.
+
+    Keys are tuples of (user_id, endpoint, view_args, query_args, data_version).
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            if cached.expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def set(self, key, body, status, mimetype):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CachedResponse(body, status, mimetype, time.monotonic() + self.ttl)
+            self._by_user.setdefault(key[0], set()).add(key)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, user_id, endpoints=None, match=None):
+        with self._lock:
+            keys = [key for key in self._by_user.get(user_id, ())
+                    if (endpoints is None or key[1] in endpoints) and (match is None or match(key))]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key):
+        cached = self._entries.pop(key)
+        self._size -= len(cached.body)
+        user_keys = self._by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._by_user[key[0]]
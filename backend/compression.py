@@ -0,0 +1,141 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli and zstandard are optional; missing codecs are simply not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/csv'}
+
+# Streamed bodies are flushed to the client once this much input has accumulated, so a
+# stream that yields one row at a time still compresses well without stalling
+STREAM_FLUSH_BYTES = 16 * 1024
+
+class _GzipStream:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+class _BrotliStream:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+class _ZstdStream:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+# name -> (one-shot compress(data, level), streaming compressor class, default level)
+CODECS = {'gzip': (lambda data, level: gzip.compress(data, compresslevel=level), _GzipStream, 6)}
+if brotli is not None:
+    CODECS['br'] = (lambda data, level: brotli.compress(data, quality=level), _BrotliStream, 4)
+if zstandard is not None:
+    CODECS['zstd'] = (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), _ZstdStream, 3)
+
+def compress_stream(chunks, stream):
+    """Compress an iterable of str/bytes chunks, closing the source when done or abandoned."""
+    try:
+        pending = 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = stream.compress(chunk)
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                out += stream.flush()
+                pending = 0
+            if out:
+                yield out
+        yield stream.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+class ResponseCompressor:
+    """Accept-Encoding negotiated compression for JSON and text responses.
+
+    `algorithms` is the server's preference order; the first one the client accepts
+    (q > 0) and that is installed wins. Buffered bodies under `min_size` are sent as-is;
+    streamed bodies are always compressed, chunk by chunk. File responses
+    (direct_passthrough), ranges and already-encoded bodies are left alone.
+    """
+
+    def __init__(self, algorithms=('zstd', 'br', 'gzip'), min_size=1024, levels=None):
+        self.algorithms = [name for name in algorithms if name in CODECS]
+        self.min_size = min_size
+        self.levels = {name: (levels or {}).get(name, CODECS[name][2]) for name in self.algorithms}
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def negotiate(self, accept_encodings):
+        for name in self.algorithms:
+            if accept_encodings[name]:
+                return name
+        return None
+
+    def compress_response(self, response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or 'Content-Range' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compress, stream_class, _ = CODECS[encoding]
+        level = self.levels[encoding]
+        if response.is_streamed:
+            response.response = compress_stream(response.response, stream_class(level))
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(compress(body, level))
+
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body differs byte-for-byte from the identity one, so a strong
+        # validator becomes weak; If-None-Match checks already compare weakly
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
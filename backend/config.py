@@ -15,3 +15,65 @@ DB_CONFIG = {
 
 DB_URL = f'postgresql://{DB_CONFIG["user"]}:{DB_CONFIG["password"]}@{DB_CONFIG["host"]}:{DB_CONFIG["port"]}/{DB_CONFIG["dbname"]}'
 DB_SECRET_KEY = os.getenv('DB_SECRET_KEY')
+
+# In-process response cache for GET /api/entries, /api/chart-data/ and /api/notes/<entry_id>
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+
+# Database connection pool sizing
+DB_POOL_CONFIG = {
+    'minconn': int(os.getenv('DB_POOL_MIN', 1)),
+    'maxconn': int(os.getenv('DB_POOL_MAX', 20)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+    'max_waiters': int(os.getenv('DB_POOL_MAX_WAITERS', 50)),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+    'ping_interval': float(os.getenv('DB_POOL_PING_INTERVAL', 30)),
+}
+
+# Password hashing
+BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None
+PASSWORD_HASH_MAX_INFLIGHT = int(os.getenv('PASSWORD_HASH_MAX_INFLIGHT', 0)) or None
+PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'process')
+
+# Token generation cache used to revoke access tokens without a per-request lookup.
+# Each worker process has its own cache, so after a logout-everywhere, password change or
+# account deletion, other workers accept the old tokens for up to TOKEN_GENERATION_CACHE_TTL
+# seconds; 0 disables the cache and checks the database on every request
+TOKEN_GENERATION_CACHE_SIZE = int(os.getenv('TOKEN_GENERATION_CACHE_SIZE', 10000))
+TOKEN_GENERATION_CACHE_TTL = int(os.getenv('TOKEN_GENERATION_CACHE_TTL', 300))
+
+# Background image variant generation
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_EXECUTOR = os.getenv('IMAGE_EXECUTOR', 'process')
+
+# Let a front proxy send upload bytes: '', 'x-accel' or 'x-sendfile'
+UPLOAD_ACCEL_MODE = os.getenv('UPLOAD_ACCEL_MODE', '')
+UPLOAD_ACCEL_PREFIX = os.getenv('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+
+# Slow-query log; EXPLAIN (ANALYZE, BUFFERS) is captured for a sample of slow reads by a
+# background thread, off the request path
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', 0.1))
+SLOW_QUERY_MAX_PLANS = int(os.getenv('SLOW_QUERY_MAX_PLANS', 50))
+QUERY_STATS_MAX_FINGERPRINTS = int(os.getenv('QUERY_STATS_MAX_FINGERPRINTS', 1000))
+
+# Bearer token Prometheus must send to scrape /metrics; /metrics is not served without one
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Users allowed to reach /api/admin/* (comma-separated user ids)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+
+# Per-user mood palettes kept in process, checked against users.data_version
+PALETTE_CACHE_SIZE = int(os.getenv('PALETTE_CACHE_SIZE', 10000))
+
+# How long /api/batch remembers an idempotency key
+IDEMPOTENCY_KEY_TTL_DAYS = int(os.getenv('IDEMPOTENCY_KEY_TTL_DAYS', 7))
+
+# How long /api/sync tombstones are kept; clients offline for longer get a 410 and resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+# JSON serializer ('orjson' or 'default') and negotiated response compression
+JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'orjson')
+COMPRESSION_ALGORITHMS = tuple(name.strip() for name in os.getenv('COMPRESSION_ALGORITHMS', 'zstd,br,gzip').split(',') if name.strip())
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
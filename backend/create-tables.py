@@ -17,13 +17,21 @@ except Exception as e:
 def drop_and_create_tables():
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute('DROP TABLE IF EXISTS users, moods, user_moods, entries, notes;')
+    cur.execute('DROP TABLE IF EXISTS users, moods, user_moods, entries, notes, mood_rollups, idempotency_keys, deletions;')
+    cur.execute('DROP SEQUENCE IF EXISTS change_seq;')
     cur.execute('''
+-- One sequence orders every change to entries, notes and user_moods, plus deletions, for /api/sync
+CREATE SEQUENCE IF NOT EXISTS change_seq;
+
 -- Create the users table
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     username VARCHAR(255) UNIQUE NOT NULL,
-    password VARCHAR(255) NOT NULL
+    password VARCHAR(255) NOT NULL,
+    data_version BIGINT NOT NULL DEFAULT 0,
+    token_generation INTEGER NOT NULL DEFAULT 0,
+    -- Highest tombstone seq pruned for this user; /api/sync answers 410 to anything older
+    sync_floor BIGINT NOT NULL DEFAULT 0
 );
 
 -- Create the moods table for general moods
@@ -38,6 +46,8 @@ CREATE TABLE IF NOT EXISTS user_moods (
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     mood_id INTEGER REFERENCES moods(id) ON DELETE CASCADE,
     color VARCHAR(50) NOT NULL,
+    change_seq BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
     UNIQUE (user_id, mood_id)
 );
 
@@ -49,17 +59,107 @@ CREATE TABLE IF NOT EXISTS entries (
     user_mood_id INTEGER REFERENCES user_moods(id) ON DELETE SET NULL,
     title VARCHAR(255) NOT NULL,
     image_path TEXT,
-    entry_text TEXT NOT NULL
+    image_variants JSONB,
+    entry_text TEXT NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(entry_text, '')), 'B')
+    ) STORED,
+    change_seq BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Keyset pagination and date-range scans walk entries in (date, id) order per user
+CREATE INDEX IF NOT EXISTS entries_user_date_id_idx ON entries (user_id, date, id);
+
+-- Let the upload garbage collector look up references by file name and content hash
+CREATE INDEX IF NOT EXISTS entries_image_name_idx ON entries ((regexp_replace(image_path, '^.*/', '')));
+CREATE INDEX IF NOT EXISTS entries_image_hash_idx ON entries ((image_variants->>'hash'));
+
 -- Create the notes table
 CREATE TABLE IF NOT EXISTS notes (
     id SERIAL PRIMARY KEY,
     entry_id VARCHAR(255) REFERENCES entries(id) ON DELETE CASCADE,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     date date NOT NULL,
-    text TEXT NOT NULL
+    text TEXT NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED,
+    change_seq BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS notes_user_entry_idx ON notes (user_id, entry_id);
+
+-- Full-text search over entry titles/bodies and note text
+CREATE INDEX IF NOT EXISTS entries_search_idx ON entries USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS notes_search_idx ON notes USING GIN (search_vector);
+
+-- Create the mood_rollups table for pre-aggregated chart data
+CREATE TABLE IF NOT EXISTS mood_rollups (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    bucket VARCHAR(5) NOT NULL CHECK (bucket IN ('day', 'week', 'month')),
+    bucket_start date NOT NULL,
+    user_mood_id INTEGER NOT NULL REFERENCES user_moods(id) ON DELETE CASCADE,
+    entry_count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, bucket, bucket_start, user_mood_id)
 );
+
+-- Results of keyed /api/batch operations, so a retried batch replays instead of re-applying
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    key VARCHAR(255) NOT NULL,
+    result JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, key)
+);
+
+-- Tombstones for deleted entries, notes and user_moods
+CREATE TABLE IF NOT EXISTS deletions (
+    seq BIGINT PRIMARY KEY DEFAULT nextval('change_seq'),
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    kind VARCHAR(20) NOT NULL,
+    row_id VARCHAR(255) NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- /api/sync reads each table in change_seq order per user
+CREATE INDEX IF NOT EXISTS entries_user_change_seq_idx ON entries (user_id, change_seq);
+CREATE INDEX IF NOT EXISTS notes_user_change_seq_idx ON notes (user_id, change_seq);
+CREATE INDEX IF NOT EXISTS user_moods_user_change_seq_idx ON user_moods (user_id, change_seq);
+CREATE INDEX IF NOT EXISTS deletions_user_seq_idx ON deletions (user_id, seq);
+-- tombstone_gc.py prunes by age
+CREATE INDEX IF NOT EXISTS deletions_deleted_at_idx ON deletions (deleted_at);
+
+-- Sequence values are drawn while holding the user's row lock, so for any one user they
+-- become visible in commit order and a client polling since=N never skips a change.
+-- Because of that lock, every write transaction must lock the user row (versions.lock_user)
+-- before it touches an entry, note or user_mood row, or two writers can deadlock
+CREATE OR REPLACE FUNCTION touch_change_seq() RETURNS trigger AS $$
+BEGIN
+    PERFORM 1 FROM users WHERE id = NEW.user_id FOR NO KEY UPDATE;
+    NEW.change_seq := nextval('change_seq');
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rows removed by a cascade from users get no tombstone: the user row is already gone
+CREATE OR REPLACE FUNCTION record_deletion() RETURNS trigger AS $$
+BEGIN
+    PERFORM 1 FROM users WHERE id = OLD.user_id FOR NO KEY UPDATE;
+    IF FOUND THEN
+        INSERT INTO deletions (user_id, kind, row_id) VALUES (OLD.user_id, TG_ARGV[0], OLD.id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER entries_change_seq BEFORE INSERT OR UPDATE ON entries FOR EACH ROW EXECUTE FUNCTION touch_change_seq();
+CREATE TRIGGER notes_change_seq BEFORE INSERT OR UPDATE ON notes FOR EACH ROW EXECUTE FUNCTION touch_change_seq();
+CREATE TRIGGER user_moods_change_seq BEFORE INSERT OR UPDATE ON user_moods FOR EACH ROW EXECUTE FUNCTION touch_change_seq();
+CREATE TRIGGER entries_tombstone AFTER DELETE ON entries FOR EACH ROW EXECUTE FUNCTION record_deletion('entry');
+CREATE TRIGGER notes_tombstone AFTER DELETE ON notes FOR EACH ROW EXECUTE FUNCTION record_deletion('note');
+CREATE TRIGGER user_moods_tombstone AFTER DELETE ON user_moods FOR EACH ROW EXECUTE FUNCTION record_deletion('user_mood');
     ''')
     conn.commit()
     cur.close()
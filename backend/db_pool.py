@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+class PoolError(Exception):
+    pass
+
+class PoolTimeout(PoolError):
+    pass
+
+class PoolExhausted(PoolError):
+    pass
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'returned_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool.
+
+    Checkouts queue for up to `timeout` seconds when every connection is in use,
+    and at most `max_waiters` threads may queue at once. Idle connections older
+    than `ping_interval` are pinged before reuse, and any connection older than
+    `max_lifetime` is closed and replaced.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=20, timeout=5.0, max_waiters=50,
+                 max_lifetime=1800.0, ping_interval=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._total = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._rejections = 0
+        self._recycled = 0
+        self._broken = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+            self._total += 1
+
+    def getconn(self):
+        started = time.monotonic()
+        record = None
+
+        with self._cond:
+            if self._closed:
+                raise PoolError("Connection pool is closed")
+            if not self._idle and self._total >= self.maxconn:
+                if self._waiting >= self.max_waiters:
+                    self._rejections += 1
+                    raise PoolExhausted("Too many threads waiting for a database connection")
+                self._waiting += 1
+                try:
+                    deadline = started + self.timeout
+                    while not self._idle and self._total >= self.maxconn:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+                        self._cond.wait(remaining)
+                        if self._closed:
+                            raise PoolError("Connection pool is closed")
+                finally:
+                    self._waiting -= 1
+
+            if self._idle:
+                record = self._idle.pop()
+            else:
+                self._total += 1
+        waited = time.monotonic() - started
+
+        try:
+            record = self._validate(record) if record else self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        checkout = time.monotonic() - started
+        with self._cond:
+            self._in_use[id(record.conn)] = record
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._checkout_total += checkout
+            self._checkout_max = max(self._checkout_max, checkout)
+        return record.conn
+
+    def putconn(self, conn, close=False):
+        with self._cond:
+            record = self._in_use.pop(id(conn), None)
+        if record is None:
+            raise PoolError("Connection was not checked out from this pool")
+
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._count('_broken')
+                close = True
+        if not close and self._expired(record):
+            self._count('_recycled')
+            close = True
+
+        if close or conn.closed:
+            self._discard(record)
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            return
+
+        record.returned_at = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._discard(record)
+                self._total -= 1
+            else:
+                self._idle.append(record)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for record in idle:
+            self._discard(record)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts or 1
+            return {
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "total": self._total,
+                "waiting": self._waiting,
+                "max_connections": self.maxconn,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "rejections": self._rejections,
+                "recycled": self._recycled,
+                "broken": self._broken,
+                "wait_avg_ms": self._wait_total / checkouts * 1000,
+                "wait_max_ms": self._wait_max * 1000,
+                "checkout_avg_ms": self._checkout_total / checkouts * 1000,
+                "checkout_max_ms": self._checkout_max * 1000,
+            }
+
+    def _count(self, counter):
+        with self._cond:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _connect(self):
+        return _PooledConnection(psycopg2.connect(self.dsn))
+
+    def _expired(self, record):
+        return self.max_lifetime and time.monotonic() - record.created_at > self.max_lifetime
+
+    def _validate(self, record):
+        # Replace connections that are past their lifetime or fail a ping after sitting idle
+        if record.conn.closed:
+            self._count('_broken')
+        elif self._expired(record):
+            self._count('_recycled')
+        elif time.monotonic() - record.returned_at < self.ping_interval:
+            return record
+        else:
+            try:
+                with record.conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                record.conn.rollback()
+                return record
+            except psycopg2.Error:
+                self._count('_broken')
+        self._discard(record)
+        return self._connect()
+
+    def _discard(self, record):
+        try:
+            record.conn.close()
+        except psycopg2.Error:
+            pass
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import time
+import uuid
+import zipfile
+from datetime import date, datetime
+
+from psycopg2.extras import RealDictCursor
+
+FETCH_SIZE = 1000
+FILE_CHUNK_SIZE = 256 * 1024
+
+# Records use the same shapes importer.py accepts, so an export can be re-imported as-is.
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(record):
+    return json.dumps(record, default=_default, separators=(',', ':'))
+
+def _named_cursor(conn, label):
+    cur = conn.cursor(name=f"export_{label}_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+    cur.itersize = FETCH_SIZE
+    return cur
+
+def iter_records(conn, user_id):
+    """Yield every record for a user from server-side cursors inside one consistent snapshot."""
+    with conn.cursor() as cur:
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT id, username FROM users WHERE id = %s", (user_id,))
+        user = cur.fetchone()
+    yield {"type": "user", "id": user['id'], "username": user['username'], "exported_at": datetime.utcnow()}
+
+    with _named_cursor(conn, 'moods') as cur:
+        cur.execute("""
+            SELECT moods.name, user_moods.color
+            FROM user_moods
+            JOIN moods ON user_moods.mood_id = moods.id
+            WHERE user_moods.user_id = %s
+            ORDER BY moods.name
+        """, (user_id,))
+        for row in cur:
+            yield {"type": "mood", "name": row['name'], "color": row['color']}
+
+    with _named_cursor(conn, 'entries') as cur:
+        cur.execute("""
+            SELECT entries.id, entries.date, entries.title, entries.entry_text, entries.image_path,
+                entries.image_variants, moods.name AS mood, user_moods.color
+            FROM entries
+            LEFT JOIN user_moods ON entries.user_mood_id = user_moods.id
+            LEFT JOIN moods ON user_moods.mood_id = moods.id
+            WHERE entries.user_id = %s
+            ORDER BY entries.date, entries.id
+        """, (user_id,))
+        for row in cur:
+            yield {"type": "entry", **row}
+
+    with _named_cursor(conn, 'notes') as cur:
+        cur.execute("""
+            SELECT entries.date AS entry_date, notes.date, notes.text
+            FROM notes
+            JOIN entries ON notes.entry_id = entries.id
+            WHERE notes.user_id = %s
+            ORDER BY entries.date, notes.id
+        """, (user_id,))
+        for row in cur:
+            yield {"type": "note", **row}
+
+def iter_image_files(conn, user_id):
+    with _named_cursor(conn, 'images') as cur:
+        cur.execute("""
+            SELECT DISTINCT regexp_replace(image_path, '^.*/', '') AS name
+            FROM entries
+            WHERE user_id = %s AND image_path IS NOT NULL
+        """, (user_id,))
+        for row in cur:
+            yield row['name']
+
+def stream_ndjson(conn, user_id):
+    for record in iter_records(conn, user_id):
+        yield dumps(record) + '\n'
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink; zipfile falls back to data descriptors and we drain it after each write."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return b''.join(chunks)
+
+def stream_zip(conn, user_id, upload_folder, include_images=True):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        info = zipfile.ZipInfo('journal.ndjson', date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, mode='w', force_zip64=True) as member:
+            for record in iter_records(conn, user_id):
+                member.write((dumps(record) + '\n').encode('utf-8'))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+
+        if include_images:
+            for name in iter_image_files(conn, user_id):
+                path = os.path.join(upload_folder, name)
+                if not os.path.isfile(path):
+                    continue
+                info = zipfile.ZipInfo.from_file(path, arcname=f"uploads/{name}")
+                # Images are already compressed; storing them saves CPU for no size cost
+                info.compress_type = zipfile.ZIP_STORED
+                with open(path, 'rb') as source, archive.open(info, mode='w', force_zip64=True) as member:
+                    while True:
+                        data = source.read(FILE_CHUNK_SIZE)
+                        if not data:
+                            break
+                        member.write(data)
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+    yield sink.drain()
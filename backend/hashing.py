@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+
+# Module-level so they can be pickled into worker processes
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check_password(password_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False
+
+def hash_cost(password_hash):
+    # bcrypt hashes look like $2b$12$<salt+digest>; the second field is the log2 work factor
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """Runs bcrypt off the request thread on a bounded worker pool.
+
+    At most `max_inflight` hashes are queued or running at once; further callers
+    block until a slot frees up, so a login storm can't grow the queue without bound.
+    """
+
+    def __init__(self, rounds=12, workers=None, max_inflight=None, executor='process'):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_inflight = max_inflight or self.workers * 4
+        self.executor_kind = executor
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_inflight)
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+        # Optional observer(operation, seconds), e.g. for latency histograms
+        self.observer = None
+
+    def hash(self, password):
+        return self._run('hash', _hash_password, password, self.rounds)
+
+    def verify(self, password_hash, password):
+        return self._run('verify', _check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "calls": self.calls,
+                "seconds": self.seconds,
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "max_inflight": self.max_inflight,
+            }
+
+    def _run(self, operation, fn, *args):
+        started = time.perf_counter()
+        with self._slots:
+            result = self._get_executor().submit(fn, *args).result()
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.calls += 1
+            self.seconds += elapsed
+        if self.observer is not None:
+            self.observer(operation, elapsed)
+        return result
+
+    def _get_executor(self):
+        # Created lazily so importing the app doesn't fork workers
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.executor_kind == 'thread':
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
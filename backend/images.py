@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it uploads are stored but no variants are rendered
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+INCOMING_PREFIX = '.incoming-'
+
+# Longest edge in pixels for each rendition
+VARIANT_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1600,
+}
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60},
+    'jpg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+def available_formats():
+    if Image is None:
+        return []
+    Image.init()
+    formats = [fmt for fmt in ('avif', 'webp') if SAVE_OPTIONS[fmt]['format'] in Image.SAVE]
+    return formats
+
+def variant_name(digest, variant, fmt):
+    return f"{digest}_{variant}.{fmt}"
+
+def fallback_format(ext):
+    return 'png' if ext in ('png', 'gif') else 'jpg'
+
+def variant_manifest(digest, ext, formats):
+    """The variant set an upload will have once its renditions are generated.
+
+    Names are derived from the content hash, so the manifest can be stored with
+    the entry before the background worker has finished.
+    """
+    manifest = {'hash': digest, 'original': f"{digest}.{ext}", 'variants': {}}
+    if Image is None:
+        return manifest
+    for variant in VARIANT_SIZES:
+        manifest['variants'][variant] = {
+            fmt: variant_name(digest, variant, fmt) for fmt in formats + [fallback_format(ext)]
+        }
+    return manifest
+
+def render_variants(folder, original, digest, ext, formats):
+    # Runs in a worker; writes each rendition to a temp file and renames it into place
+    with Image.open(os.path.join(folder, original)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+        for variant, size in VARIANT_SIZES.items():
+            rendition = source.copy()
+            rendition.thumbnail((size, size), Image.LANCZOS)
+            for fmt in formats + [fallback_format(ext)]:
+                target = os.path.join(folder, variant_name(digest, variant, fmt))
+                if os.path.exists(target):
+                    continue
+                image = rendition.convert('RGB') if fmt == 'jpg' else rendition
+                fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=INCOMING_PREFIX)
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        image.save(out, **SAVE_OPTIONS[fmt])
+                    os.replace(tmp_path, target)
+                except Exception:
+                    os.unlink(tmp_path)
+                    raise
+
+class ImageStore:
+    """Content-addressed upload storage with background rendition generation."""
+
+    def __init__(self, folder, workers=2, executor='process'):
+        self.folder = folder
+        self.workers = workers
+        self.executor_kind = executor
+        self.formats = available_formats()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def save(self, file_storage, ext):
+        digest, tmp_path = self._stream_to_disk(file_storage)
+        original = f"{digest}.{ext}"
+        final_path = os.path.join(self.folder, original)
+
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)
+            # Refresh the mtime so the orphan collector's grace period covers the reuse
+            os.utime(final_path)
+        else:
+            os.replace(tmp_path, final_path)
+
+        manifest = variant_manifest(digest, ext, self.formats)
+        if manifest['variants'] and not self._variants_exist(manifest):
+            future = self._get_executor().submit(render_variants, self.folder, original, digest, ext, self.formats)
+            future.add_done_callback(self._log_failure)
+        return manifest
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _stream_to_disk(self, file_storage):
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=INCOMING_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return sha.hexdigest(), tmp_path
+
+    def _variants_exist(self, manifest):
+        return all(os.path.exists(os.path.join(self.folder, name))
+                   for formats in manifest['variants'].values() for name in formats.values())
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_kind == 'thread':
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    @staticmethod
+    def _log_failure(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Error generating image variants: {str(error)}")
@@ -0,0 +1,252 @@
+"""Bulk journal import: entries, moods and notes from NDJSON or CSV.
+
+NDJSON lines are entry objects ({"date", "title", "entry_text", "mood", "color", "notes": [...]}),
+or {"type": "mood", "name", "color"} / {"type": "note", "entry_date", "date", "text"} records.
+A {"type": "user"} header, as written by exporter.py, is skipped.
+CSV files have a header with date,title,entry_text and optionally mood,color,notes, where
+notes is a JSON array of strings or {"date", "text"} objects.
+
+Usage: python importer.py --user alice [--format ndjson|csv] journal.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import tempfile
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from config import DB_CONFIG
+from rollups import rebuild_rollups
+from versions import bump_data_version, lock_user
+
+DEFAULT_MOOD_COLOR = '#9ca3af'
+SPOOL_SIZE = 8 * 1024 * 1024
+
+class JournalImportError(ValueError):
+    pass
+
+class _Spool:
+    """CSV rows for one staging table, kept in memory until they outgrow SPOOL_SIZE."""
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='w+', newline='')
+        self.writer = csv.writer(self.file)
+        self.rows = 0
+
+    def write(self, row):
+        self.writer.writerow(['\\N' if value is None else value for value in row])
+        self.rows += 1
+
+    def copy_into(self, cur, table, columns):
+        self.file.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", self.file)
+
+    def close(self):
+        self.file.close()
+
+def _required(record, field, line_no):
+    value = record.get(field)
+    if value in (None, ''):
+        raise JournalImportError(f"Line {line_no}: missing {field}")
+    return value
+
+def _add_notes(notes, spool, entry_date, line_no):
+    if isinstance(notes, str):
+        if notes.strip().startswith('['):
+            try:
+                notes = json.loads(notes)
+            except ValueError:
+                raise JournalImportError(f"Line {line_no}: invalid JSON in notes")
+        else:
+            notes = [notes]
+    if notes and not isinstance(notes, list):
+        raise JournalImportError(f"Line {line_no}: notes must be a list")
+    for note in notes or []:
+        if isinstance(note, str):
+            spool.write((entry_date, None, note))
+        elif isinstance(note, dict):
+            spool.write((entry_date, note.get('date'), _required(note, 'text', line_no)))
+        else:
+            raise JournalImportError(f"Line {line_no}: each note must be a string or an object")
+
+def _stage_record(record, line_no, spools):
+    kind = record.get('type', 'entry')
+    if kind == 'user':
+        # Export header; the records are imported into whichever account runs the import
+        return
+    if kind == 'mood':
+        spools['moods'].write((_required(record, 'name', line_no), record.get('color') or None))
+    elif kind == 'note':
+        spools['notes'].write((_required(record, 'entry_date', line_no), record.get('date'),
+                               _required(record, 'text', line_no)))
+    elif kind == 'entry':
+        entry_date = _required(record, 'date', line_no)
+        spools['entries'].write((line_no, entry_date, _required(record, 'title', line_no),
+                                 record.get('entry_text') or '', record.get('mood') or None,
+                                 record.get('color') or None, record.get('image_path') or None))
+        _add_notes(record.get('notes'), spools['notes'], entry_date, line_no)
+    else:
+        raise JournalImportError(f"Line {line_no}: unknown record type {kind!r}")
+
+def parse_records(stream, fmt):
+    """Yield (line_no, record) from a text stream without reading it all into memory."""
+    if fmt == 'ndjson':
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise JournalImportError(f"Line {line_no}: invalid JSON")
+                if not isinstance(record, dict):
+                    raise JournalImportError(f"Line {line_no}: expected a JSON object")
+                yield line_no, record
+    elif fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+    else:
+        raise JournalImportError(f"Unsupported format {fmt!r}")
+
+def import_journal(conn, user_id, stream, fmt):
+    """Stage the file with COPY and merge it into entries/notes/user_moods in one transaction."""
+    started = time.perf_counter()
+    spools = {'entries': _Spool(), 'notes': _Spool(), 'moods': _Spool()}
+
+    try:
+        for line_no, record in parse_records(stream, fmt):
+            _stage_record(record, line_no, spools)
+
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            lock_user(cur, user_id)
+            cur.execute("""
+                CREATE TEMP TABLE import_entries (
+                    line_no INTEGER, date date, title VARCHAR(255), entry_text TEXT,
+                    mood_name VARCHAR(50), mood_color VARCHAR(50), image_path TEXT
+                ) ON COMMIT DROP;
+                CREATE TEMP TABLE import_notes (entry_date date, date date, text TEXT) ON COMMIT DROP;
+                CREATE TEMP TABLE import_moods (name VARCHAR(50), color VARCHAR(50)) ON COMMIT DROP;
+            """)
+            spools['entries'].copy_into(cur, 'import_entries',
+                                        ['line_no', 'date', 'title', 'entry_text', 'mood_name', 'mood_color', 'image_path'])
+            spools['notes'].copy_into(cur, 'import_notes', ['entry_date', 'date', 'text'])
+            spools['moods'].copy_into(cur, 'import_moods', ['name', 'color'])
+
+            # Every mood name mentioned anywhere in the file, with the last explicit color given for it
+            cur.execute("""
+                CREATE TEMP TABLE import_palette ON COMMIT DROP AS
+                SELECT name, (array_agg(color ORDER BY ord DESC) FILTER (WHERE color IS NOT NULL))[1] AS color
+                FROM (
+                    SELECT mood_name AS name, mood_color AS color, line_no AS ord FROM import_entries WHERE mood_name IS NOT NULL
+                    UNION ALL
+                    SELECT name, color, 2147483647 AS ord FROM import_moods
+                ) named
+                GROUP BY name
+            """)
+            cur.execute("INSERT INTO moods (name) SELECT name FROM import_palette ON CONFLICT (name) DO NOTHING")
+            moods_created = cur.rowcount
+            cur.execute("""
+                INSERT INTO user_moods (user_id, mood_id, color)
+                SELECT %s, moods.id, COALESCE(import_palette.color, %s)
+                FROM import_palette
+                JOIN moods ON moods.name = import_palette.name
+                ON CONFLICT (user_id, mood_id) DO NOTHING
+            """, (user_id, DEFAULT_MOOD_COLOR))
+            cur.execute("""
+                UPDATE user_moods SET color = import_palette.color
+                FROM import_palette
+                JOIN moods ON moods.name = import_palette.name
+                WHERE user_moods.user_id = %s
+                AND user_moods.mood_id = moods.id
+                AND import_palette.color IS NOT NULL
+                AND user_moods.color <> import_palette.color
+            """, (user_id,))
+
+            # Entry ids follow the same <user>_<date> scheme as POST /api/entries; the last row for a date wins
+            cur.execute("""
+                INSERT INTO entries (id, user_id, date, user_mood_id, title, image_path, entry_text)
+                SELECT DISTINCT ON (ie.date)
+                    %(user_id)s || '_' || to_char(ie.date, 'YYYY-MM-DD'), %(user_id)s, ie.date,
+                    user_moods.id, ie.title, ie.image_path, ie.entry_text
+                FROM import_entries ie
+                LEFT JOIN moods ON moods.name = ie.mood_name
+                LEFT JOIN user_moods ON user_moods.mood_id = moods.id AND user_moods.user_id = %(user_id)s
+                ORDER BY ie.date, ie.line_no DESC
+                ON CONFLICT (id) DO UPDATE
+                SET user_mood_id = EXCLUDED.user_mood_id,
+                    title = EXCLUDED.title,
+                    image_path = COALESCE(EXCLUDED.image_path, entries.image_path),
+                    entry_text = EXCLUDED.entry_text
+            """, {'user_id': user_id})
+            entries_merged = cur.rowcount
+
+            # Notes already present with the same text are skipped, so re-running an import is harmless
+            cur.execute("""
+                INSERT INTO notes (entry_id, user_id, date, text)
+                SELECT DISTINCT entries.id, %(user_id)s, COALESCE(import_notes.date, import_notes.entry_date), import_notes.text
+                FROM import_notes
+                JOIN entries ON entries.user_id = %(user_id)s AND entries.date = import_notes.entry_date
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM notes
+                    WHERE notes.entry_id = entries.id AND notes.user_id = %(user_id)s AND notes.text = import_notes.text
+                )
+            """, {'user_id': user_id})
+            notes_inserted = cur.rowcount
+
+            cur.execute("SELECT min(date) AS start_date, max(date) AS end_date FROM import_entries")
+            span = cur.fetchone()
+            if span['start_date']:
+                rebuild_rollups(cur, user_id, span['start_date'], span['end_date'])
+            bump_data_version(cur, user_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(spool.rows for spool in spools.values())
+    return {
+        "rows": rows,
+        "entries": entries_merged,
+        "notes": notes_inserted,
+        "moods_created": moods_created,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+        "start_date": span['start_date'],
+        "end_date": span['end_date'],
+    }
+
+def detect_format(filename, declared=None):
+    if declared:
+        return declared
+    return 'csv' if filename and filename.lower().endswith('.csv') else 'ndjson'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--user', required=True, help="Username to import into")
+    parser.add_argument('--format', choices=['ndjson', 'csv'])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT id FROM users WHERE username = %s", (args.user,))
+            user = cur.fetchone()
+        if not user:
+            raise SystemExit(f"No such user: {args.user}")
+
+        with io.open(args.path, encoding='utf-8', newline='') as stream:
+            report = import_journal(conn, user['id'], stream, detect_format(args.path, args.format))
+    finally:
+        conn.close()
+
+    print(f"Imported {report['rows']} rows ({report['entries']} entries, {report['notes']} notes, "
+          f"{report['moods_created']} new moods) in {report['seconds']}s: {report['rows_per_second']} rows/s")
+
+if __name__ == "__main__":
+    main()
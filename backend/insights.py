@@ -0,0 +1,165 @@
+from datetime import date, timedelta
+
+ROLLING_WINDOWS = (7, 30)
+DEFAULT_SPAN_DAYS = 365
+MAX_SPAN_DAYS = 3 * 366
+
+# One mood per logged day, read from the day rollups: the most frequent mood that day,
+# ties going to the lower user_mood_id. Every query below works from this compact series.
+DAILY_MOODS = """
+    daily AS (
+        SELECT DISTINCT ON (bucket_start) bucket_start AS day, user_mood_id
+        FROM mood_rollups
+        WHERE user_id = %(user_id)s
+        AND bucket = 'day'
+        AND bucket_start BETWEEN %(warmup_start)s AND %(end)s
+        ORDER BY bucket_start, entry_count DESC, user_mood_id
+    ),
+    in_range AS (
+        SELECT day, user_mood_id FROM daily WHERE day >= %(start)s
+    )
+"""
+
+def parse_range(start_raw, end_raw, today=None):
+    """Resolve startDate/endDate query args; defaults to the year ending today."""
+    try:
+        end_date = date.fromisoformat(end_raw) if end_raw else (today or date.today())
+        start_date = date.fromisoformat(start_raw) if start_raw else end_date - timedelta(days=DEFAULT_SPAN_DAYS - 1)
+    except ValueError:
+        raise ValueError("startDate and endDate must be YYYY-MM-DD")
+    if start_date > end_date:
+        raise ValueError("startDate must not be after endDate")
+    if (end_date - start_date).days >= MAX_SPAN_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_SPAN_DAYS} days")
+    return start_date, end_date
+
+NO_STREAK = {"user_mood_id": None, "start_date": None, "end_date": None, "length": 0}
+
+def _streaks(cur, params, today):
+    # Gaps and islands: within one mood, consecutive days share day - row_number()
+    cur.execute(f"""
+        WITH {DAILY_MOODS},
+        runs AS (
+            SELECT user_mood_id, min(day) AS start_date, max(day) AS end_date, count(*) AS length
+            FROM (
+                SELECT user_mood_id, day,
+                    day - (row_number() OVER (PARTITION BY user_mood_id ORDER BY day))::int AS island
+                FROM in_range
+            ) islands
+            GROUP BY user_mood_id, island
+        )
+        SELECT user_mood_id, start_date, end_date, length, is_longest, is_current
+        FROM (
+            SELECT runs.*,
+                row_number() OVER (PARTITION BY user_mood_id ORDER BY length DESC, end_date DESC) = 1 AS is_longest,
+                end_date = max(end_date) OVER () AS is_current
+            FROM runs
+        ) ranked
+        WHERE is_longest OR is_current
+    """, params)
+    longest = {}
+    current = None
+    for row in cur.fetchall():
+        run = {"user_mood_id": row['user_mood_id'], "start_date": row['start_date'],
+               "end_date": row['end_date'], "length": row['length']}
+        if row['is_longest']:
+            longest[row['user_mood_id']] = run
+        # The latest run is only still going if it reaches today or yesterday: today's entry
+        # may simply not be written yet, but a longer gap means the streak has ended
+        if row['is_current'] and row['end_date'] >= today - timedelta(days=1):
+            current = run
+    return {"current": current or NO_STREAK, "longest": longest}
+
+def _weekdays(cur, params):
+    cur.execute(f"""
+        WITH {DAILY_MOODS}
+        SELECT user_mood_id, extract(isodow FROM day)::int AS weekday, count(*) AS days
+        FROM in_range
+        GROUP BY user_mood_id, weekday
+    """, params)
+    weekdays = {}
+    for row in cur.fetchall():
+        weekdays.setdefault(row['user_mood_id'], [0] * 7)[row['weekday'] - 1] = row['days']
+    return weekdays
+
+def _transitions(cur, params):
+    # Only pairs of consecutive calendar days count; a gap in logging breaks the chain
+    cur.execute(f"""
+        WITH {DAILY_MOODS}
+        SELECT from_mood, to_mood, count(*) AS count,
+            round(count(*)::numeric / sum(count(*)) OVER (PARTITION BY from_mood), 4)::float8 AS probability
+        FROM (
+            SELECT user_mood_id AS from_mood, day,
+                lead(user_mood_id) OVER (ORDER BY day) AS to_mood,
+                lead(day) OVER (ORDER BY day) AS next_day
+            FROM in_range
+        ) pairs
+        WHERE next_day = day + 1
+        GROUP BY from_mood, to_mood
+        ORDER BY from_mood, to_mood
+    """, params)
+    return cur.fetchall()
+
+def _rolling(cur, params, moods):
+    # Share of logged days in each trailing window that had the mood; windows reach back
+    # before startDate (the warmup) so the first days of the range have full windows
+    shares = ',\n'.join(
+        f"""round(sum(hit) OVER w{n}::numeric / NULLIF(sum(logged) OVER w{n}, 0), 4)::float8 AS share_{n}"""
+        for n in ROLLING_WINDOWS
+    )
+    windows = ',\n'.join(
+        f"w{n} AS (PARTITION BY user_mood_id ORDER BY day ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)"
+        for n in ROLLING_WINDOWS
+    )
+    cur.execute(f"""
+        WITH {DAILY_MOODS},
+        grid AS (
+            SELECT calendar.day::date AS day, palette.user_mood_id,
+                (daily.user_mood_id IS NOT DISTINCT FROM palette.user_mood_id)::int AS hit,
+                (daily.day IS NOT NULL)::int AS logged
+            FROM generate_series(%(warmup_start)s::date, %(end)s::date, interval '1 day') AS calendar(day)
+            CROSS JOIN unnest(%(moods)s::int[]) AS palette(user_mood_id)
+            LEFT JOIN daily ON daily.day = calendar.day
+        )
+        SELECT day, user_mood_id, {shares}
+        FROM grid
+        WINDOW {windows}
+        ORDER BY day, user_mood_id
+    """, {**params, 'moods': moods})
+
+    rolling = {"dates": [], **{f"share_{n}": {mood: [] for mood in moods} for n in ROLLING_WINDOWS}}
+    for row in cur.fetchall():
+        if row['day'] < params['start']:
+            continue
+        if not rolling["dates"] or rolling["dates"][-1] != row['day']:
+            rolling["dates"].append(row['day'])
+        for n in ROLLING_WINDOWS:
+            rolling[f"share_{n}"][row['user_mood_id']].append(row[f"share_{n}"])
+    return rolling
+
+def mood_insights(cur, user_id, start_date, end_date, palette, today=None):
+    """Streaks, weekday distribution, next-day transitions and rolling shares for a date range.
+
+    `today` is the client's calendar date (default: the server's), used to decide whether
+    the latest streak is still current.
+    """
+    params = {
+        'user_id': user_id,
+        'start': start_date,
+        'end': end_date,
+        'warmup_start': start_date - timedelta(days=max(ROLLING_WINDOWS) - 1),
+    }
+
+    cur.execute(f"WITH {DAILY_MOODS} SELECT count(*) AS days FROM in_range", params)
+    days_logged = cur.fetchone()['days']
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "days_logged": days_logged,
+        "palette": palette,
+        "streaks": _streaks(cur, params, today or date.today()),
+        "weekdays": _weekdays(cur, params),
+        "transitions": _transitions(cur, params),
+        "rolling": _rolling(cur, params, sorted(palette)),
+    }
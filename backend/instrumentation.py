@@ -0,0 +1,82 @@
+import time
+
+# Thin proxies around psycopg2 connections and cursors. Every statement run through
+# them is timed and reported to the registered listeners, which is how metrics and
+# query tracing see all handlers without each one having to opt in.
+
+_query_listeners = []
+
+def add_query_listener(listener):
+    """listener(sql, params, seconds, cursor) is called after every statement, including failed ones."""
+    _query_listeners.append(listener)
+
+def _notify(sql, params, seconds, cursor):
+    for listener in _query_listeners:
+        listener(sql, params, seconds, cursor)
+
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            _notify(sql, params, time.perf_counter() - started, self._cursor)
+
+    def executemany(self, sql, params_seq):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, params_seq)
+        finally:
+            _notify(sql, None, time.perf_counter() - started, self._cursor)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return self._cursor.copy_expert(sql, file, size)
+        finally:
+            _notify(sql, None, time.perf_counter() - started, self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name == '_cursor':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        if name == '_conn':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
@@ -0,0 +1,131 @@
+import hmac
+import logging
+import time
+
+from flask import Response, g, has_request_context, request
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # prometheus_client is optional; without it /metrics is not registered
+    CollectorRegistry = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+HASH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+class _StatsCollector:
+    """Exposes the pool, cache and hasher stats() dicts as gauges and counters at scrape time."""
+
+    def __init__(self, pool, cache, hasher):
+        self.pool = pool
+        self.cache = cache
+        self.hasher = hasher
+
+    def collect(self):
+        pool = self.pool.stats()
+        for name in ('in_use', 'idle', 'total', 'waiting', 'max_connections'):
+            yield GaugeMetricFamily(f'ebb_db_pool_{name}', f"Connection pool {name.replace('_', ' ')}", value=pool[name])
+        for name in ('checkouts', 'timeouts', 'rejections', 'recycled', 'broken'):
+            yield CounterMetricFamily(f'ebb_db_pool_{name}', f"Connection pool {name}", value=pool[name])
+
+        cache = self.cache.stats()
+        for name in ('hits', 'misses', 'evictions', 'invalidations'):
+            yield CounterMetricFamily(f'ebb_response_cache_{name}', f"Response cache {name}", value=cache[name])
+        yield GaugeMetricFamily('ebb_response_cache_entries', "Response cache entries", value=cache['entries'])
+        yield GaugeMetricFamily('ebb_response_cache_bytes', "Response cache size in bytes", value=cache['bytes'])
+
+        hasher = self.hasher.stats()
+        yield GaugeMetricFamily('ebb_password_hash_inflight_limit', "Password hashes allowed in flight",
+                                value=hasher['max_inflight'])
+
+class Metrics:
+    """Prometheus metrics fed by request hooks, the database proxies and the password hasher.
+
+    Request metrics are recorded at teardown rather than in after_request, so streamed
+    responses are timed to the last chunk and their queries are counted.
+    """
+
+    def __init__(self):
+        self.enabled = CollectorRegistry is not None
+        if not self.enabled:
+            return
+        self.registry = CollectorRegistry(auto_describe=True)
+        self.requests = Counter('ebb_http_requests_total', "HTTP requests",
+                                ['method', 'route', 'status'], registry=self.registry)
+        self.latency = Histogram('ebb_http_request_duration_seconds', "HTTP request latency",
+                                 ['method', 'route'], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.request_queries = Histogram('ebb_db_queries_per_request', "Database statements per request",
+                                         ['route'], buckets=QUERY_COUNT_BUCKETS, registry=self.registry)
+        self.request_query_time = Histogram('ebb_db_query_seconds_per_request', "Cumulative database time per request",
+                                            ['route'], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.query_duration = Histogram('ebb_db_query_duration_seconds', "Database statement latency",
+                                        buckets=QUERY_BUCKETS, registry=self.registry)
+        self.checkout_wait = Histogram('ebb_db_pool_checkout_seconds', "Time spent waiting for a pooled connection",
+                                       buckets=QUERY_BUCKETS, registry=self.registry)
+        self.password_hash = Histogram('ebb_password_hash_seconds', "bcrypt time including queueing for a worker",
+                                       ['operation'], buckets=HASH_BUCKETS, registry=self.registry)
+
+    def init_app(self, app, pool, cache, hasher, token=None):
+        # /metrics carries the same pool and cache internals as the admin-only stats
+        # endpoints, so it is only served to scrapers presenting `token` as a bearer token
+        if not self.enabled:
+            logger.warning("prometheus_client is not installed; /metrics is disabled")
+            return
+        self.token = token
+        self.registry.register(_StatsCollector(pool, cache, hasher))
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        if token:
+            app.add_url_rule('/metrics', 'metrics', self._expose)
+        else:
+            logger.warning("METRICS_TOKEN is not set; /metrics is disabled")
+
+    def observe_query(self, sql, params, seconds, cursor):
+        if not self.enabled:
+            return
+        self.query_duration.observe(seconds)
+        if has_request_context() and 'metrics_started' in g:
+            g.db_queries += 1
+            g.db_seconds += seconds
+
+    def observe_checkout(self, seconds):
+        if self.enabled:
+            self.checkout_wait.observe(seconds)
+
+    def observe_password_hash(self, operation, seconds):
+        if self.enabled:
+            self.password_hash.labels(operation).observe(seconds)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, error=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route = _route()
+        self.requests.labels(request.method, route, str(g.pop('metrics_status', 500))).inc()
+        self.latency.labels(request.method, route).observe(time.perf_counter() - started)
+        self.request_queries.labels(route).observe(g.db_queries)
+        self.request_query_time.labels(route).observe(g.db_seconds)
+
+    def _expose(self):
+        scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(presented.encode('utf-8'), self.token.encode('utf-8')):
+            return Response("Unauthorized\n", status=401, mimetype='text/plain',
+                            headers={'WWW-Authenticate': 'Bearer'})
+        return Response(generate_latest(self.registry), content_type=CONTENT_TYPE_LATEST)
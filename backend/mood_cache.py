@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+# Single statement, so two users introducing the same new mood name at once both get
+# its id instead of one of them hitting the UNIQUE constraint. The no-op DO UPDATE is
+# what makes RETURNING include rows that already existed; xmax = 0 marks fresh inserts.
+UPSERT_MOODS = """
+    INSERT INTO moods (name)
+    SELECT DISTINCT unnest(%s::text[])
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING id, name, (xmax = 0) AS is_new
+"""
+
+def load_palette(cur, user_id):
+    cur.execute("""
+        SELECT user_moods.id, moods.name, user_moods.color
+        FROM user_moods
+        JOIN moods ON user_moods.mood_id = moods.id
+        WHERE user_moods.user_id = %s
+    """, (user_id,))
+    return {row['id']: {"name": row['name'], "color": row['color']} for row in cur.fetchall()}
+
+class MoodCatalog:
+    """Process-local name -> id map of the global moods table.
+
+    Moods are never renamed or deleted, so a cached id can't go stale. Ids of moods
+    created inside a transaction are only cached once the caller reports the commit
+    through remember(), so a rollback never leaves a dangling id behind.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, cur, names):
+        """Return {name: {"id", "is_new"}}, upserting only the names not already cached."""
+        resolved = {}
+        with self._lock:
+            for name in names:
+                if name in self._ids:
+                    resolved[name] = {"id": self._ids[name], "is_new": False}
+            self.hits += len(resolved)
+            self.misses += len(set(names)) - len(resolved)
+
+        missing = [name for name in names if name not in resolved]
+        if missing:
+            cur.execute(UPSERT_MOODS, (missing,))
+            for row in cur.fetchall():
+                resolved[row['name']] = {"id": row['id'], "is_new": row['is_new']}
+            self.remember(resolved, committed=False)
+        return resolved
+
+    def remember(self, resolved, committed=True):
+        with self._lock:
+            for name, mood in resolved.items():
+                if committed or not mood['is_new']:
+                    self._ids[name] = mood['id']
+
+    def stats(self):
+        with self._lock:
+            return {"moods": len(self._ids), "hits": self.hits, "misses": self.misses}
+
+class PaletteCache:
+    """Bounded LRU of each user's palette ({user_mood_id: {name, color}}), tagged with users.data_version.
+
+    Every palette write bumps data_version, so a lookup at the caller's current version
+    never returns a palette changed by another worker; local writes also drop the entry.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cur, user_id, version=None):
+        if version is None:
+            return load_palette(cur, user_id)
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        palette = load_palette(cur, user_id)
+        with self._lock:
+            self._entries[user_id] = (version, palette)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return palette
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import date
+
+# Opaque keyset cursors. The token is just the sort key of the last row served,
+# so the next page starts with an index seek instead of an OFFSET scan.
+
+def encode_cursor(*values):
+    key = [v.isoformat() if isinstance(v, date) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token, size, parsers=None):
+    # parsers, one per key column (e.g. date.fromisoformat), turn a tampered cursor into a
+    # ValueError here rather than a type error in the query
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("Invalid cursor")
+    if parsers:
+        try:
+            key = [parse(value) for parse, value in zip(parsers, key)]
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return key
+
+def parse_limit(raw, default, maximum):
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+def stream_json_array(rows, dumps):
+    # Yields a JSON array one row at a time so the full result is never held in memory
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield dumps(row)
+        else:
+            yield ',' + dumps(row)
+    yield ']'
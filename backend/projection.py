@@ -0,0 +1,67 @@
+# Column whitelist for entry listings. Clients pick fields by name with ?fields= or take
+# the calendar-grid set with ?view=summary; only whitelisted expressions ever reach SQL.
+
+PREVIEW_DEFAULT = 120
+PREVIEW_MAX = 1000
+
+ENTRY_FIELDS = {
+    'id': "entries.id",
+    'user_id': "entries.user_id",
+    'date': "entries.date",
+    'user_mood_id': "entries.user_mood_id",
+    'title': "entries.title",
+    'image_path': "entries.image_path",
+    'image_variants': "entries.image_variants",
+    'entry_text': "entries.entry_text",
+    'mood_color': "user_moods.color",
+    'mood_name': "moods.name",
+    'has_image': "entries.image_path IS NOT NULL",
+    # Truncated in SQL so the full text never leaves the database
+    'preview': ("CASE WHEN length(entries.entry_text) > {length} "
+                "THEN rtrim(left(entries.entry_text, {length})) || '…' ELSE entries.entry_text END"),
+}
+
+FULL_FIELDS = ('id', 'user_id', 'date', 'user_mood_id', 'title', 'image_path', 'image_variants',
+               'entry_text', 'mood_color', 'mood_name')
+SUMMARY_FIELDS = ('id', 'date', 'user_mood_id', 'title', 'mood_color', 'has_image', 'preview')
+
+# Keyset cursors and client-side keys need these whatever was asked for
+ALWAYS_FIELDS = ('id', 'date')
+
+MOOD_JOINS = """
+    LEFT JOIN user_moods ON entries.user_mood_id = user_moods.id
+    LEFT JOIN moods ON user_moods.mood_id = moods.id
+"""
+
+def parse_projection(fields, view, preview):
+    """Resolve ?fields=, ?view= and ?preview= into an ordered tuple of field names and a preview length."""
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in ENTRY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    elif view in (None, '', 'full'):
+        names = list(FULL_FIELDS)
+    elif view == 'summary':
+        names = list(SUMMARY_FIELDS)
+    else:
+        raise ValueError("view must be one of: full, summary")
+
+    if preview is None:
+        length = PREVIEW_DEFAULT
+    else:
+        try:
+            length = int(preview)
+        except ValueError:
+            raise ValueError("preview must be an integer")
+        if not 1 <= length <= PREVIEW_MAX:
+            raise ValueError(f"preview must be between 1 and {PREVIEW_MAX}")
+
+    names = [name for name in ALWAYS_FIELDS if name not in names] + names
+    return tuple(dict.fromkeys(names)), length
+
+def entry_select(names, preview_length):
+    """SELECT list and the joins it needs; the mood tables are only joined when a mood field is asked for."""
+    columns = ', '.join(f"{ENTRY_FIELDS[name].format(length=int(preview_length))} AS {name}" for name in names)
+    joins = MOOD_JOINS if {'mood_color', 'mood_name'} & set(names) else ''
+    return columns, joins
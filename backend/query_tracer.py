@@ -0,0 +1,204 @@
+import hashlib
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_NAMED_CURSOR_IDS = re.compile(r'\b(\w+?_)[0-9a-f]{32}\b')
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(sql):
+    """Normalize a statement so calls that differ only in literals and parameters group together."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _COMMENTS.sub(' ', str(sql))
+    sql = _STRINGS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _LISTS.sub('(?+)', sql)
+    sql = _NAMED_CURSOR_IDS.sub(r'\1?', sql)
+    return _WHITESPACE.sub(' ', sql).strip().lower()
+
+def fingerprint_id(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+def _explainable(normalized):
+    # EXPLAIN ANALYZE runs the statement, so only plain reads are ever re-executed
+    return (normalized.startswith(('select', 'with'))
+            and not re.search(r'\b(insert|update|delete|for update|for share|nextval|setval)\b', normalized))
+
+class _FingerprintStats:
+    __slots__ = ('sql', 'calls', 'total', 'max', 'slow', 'recent', 'last_explained')
+
+    def __init__(self, sql, window):
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.recent = deque(maxlen=window)
+        self.last_explained = 0.0
+
+    def summary(self, fid):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] * 1000 if recent else None
+
+        return {
+            "id": fid,
+            "fingerprint": self.sql,
+            "calls": self.calls,
+            "slow": self.slow,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.calls * 1000 if self.calls else None,
+            "max_ms": self.max * 1000,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+        }
+
+class QueryTracer:
+    """Per-fingerprint latency stats plus a log of slow statements with sampled plans.
+
+    Registered as a query listener on the instrumented cursors. Statements slower than
+    `threshold_ms` are logged with the route and user from `context()`, and a
+    `sample_rate` fraction of them (at most once per fingerprint per `explain_interval`
+    seconds) are handed to a background thread that re-runs them under
+    EXPLAIN (ANALYZE, BUFFERS) on a connection from `explain_connection()`, in a
+    read-only transaction with `explain_timeout_ms` as its statement timeout. The request
+    that hit the slow query never waits for the plan; when the queue is full, the sample
+    is dropped. Without `explain_connection` no plans are captured.
+    """
+
+    def __init__(self, logger, context, threshold_ms=200, sample_rate=0.1, max_plans=50,
+                 max_fingerprints=1000, window=500, explain_interval=60, explain_connection=None,
+                 explain_queue_size=8, explain_timeout_ms=30000):
+        self.logger = logger
+        self.context = context
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.max_fingerprints = max_fingerprints
+        self.window = window
+        self.explain_interval = explain_interval
+        self._stats = OrderedDict()
+        self._plans = deque(maxlen=max_plans)
+        self._lock = threading.Lock()
+        self.explain_connection = explain_connection
+        self.explain_timeout_ms = explain_timeout_ms
+        self._explain_queue = queue.Queue(maxsize=explain_queue_size)
+        self._explain_thread = None
+        if explain_connection is not None:
+            self._explain_thread = threading.Thread(target=self._explain_worker, name='query-tracer-explain',
+                                                    daemon=True)
+            self._explain_thread.start()
+
+    def on_query(self, sql, params, seconds, cursor):
+        normalized = fingerprint(sql)
+        fid = fingerprint_id(normalized)
+        slow = seconds >= self.threshold
+        explain = False
+
+        with self._lock:
+            stats = self._stats.get(fid)
+            if stats is None:
+                stats = self._stats[fid] = _FingerprintStats(normalized, self.window)
+                if len(self._stats) > self.max_fingerprints:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(fid)
+            stats.calls += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.recent.append(seconds)
+            if slow:
+                stats.slow += 1
+                now = time.monotonic()
+                if (self._explain_thread is not None and random.random() < self.sample_rate
+                        and now - stats.last_explained >= self.explain_interval and _explainable(normalized)):
+                    stats.last_explained = now
+                    explain = True
+
+        if not slow:
+            return
+        route, user_id = self.context()
+        self.logger.warning(f"Slow query {seconds * 1000:.1f}ms [{fid}] route={route} user={user_id}: {normalized}")
+        if explain:
+            self._queue_plan(cursor, sql, params, normalized, fid, seconds, route, user_id)
+
+    def stats(self, limit=50, order_by='total_ms'):
+        with self._lock:
+            summaries = [stats.summary(fid) for fid, stats in self._stats.items()]
+        summaries.sort(key=lambda s: s[order_by] or 0, reverse=True)
+        return summaries[:limit]
+
+    def plans(self):
+        with self._lock:
+            return list(reversed(self._plans))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._plans.clear()
+
+    def shutdown(self, timeout=5):
+        if self._explain_thread is not None:
+            self._explain_queue.put(None)
+            self._explain_thread.join(timeout)
+
+    def _queue_plan(self, cursor, sql, params, normalized, fid, seconds, route, user_id):
+        # Named (server-side) cursors hold no re-runnable statement text
+        if cursor.name:
+            return
+        try:
+            statement = cursor.mogrify(sql, params)
+        except Exception as e:
+            self.logger.error(f"Error preparing plan capture for query {fid}: {str(e)}")
+            return
+        try:
+            self._explain_queue.put_nowait((statement, normalized, fid, seconds, route, user_id))
+        except queue.Full:
+            pass
+
+    def _explain_worker(self):
+        while True:
+            job = self._explain_queue.get()
+            if job is None:
+                return
+            self._capture_plan(*job)
+
+    def _capture_plan(self, statement, normalized, fid, seconds, route, user_id):
+        try:
+            with self.explain_connection() as conn:
+                try:
+                    with conn.cursor() as explain_cur:
+                        # Read-only, so a statement _explainable() misjudged still can't write
+                        explain_cur.execute("SET TRANSACTION READ ONLY")
+                        explain_cur.execute("SET LOCAL statement_timeout = %s", (self.explain_timeout_ms,))
+                        explain_cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + statement)
+                        plan = '\n'.join(row[0] for row in explain_cur.fetchall())
+                finally:
+                    conn.rollback()
+        except Exception as e:
+            self.logger.error(f"Error capturing plan for query {fid}: {str(e)}")
+            return
+
+        with self._lock:
+            self._plans.append({
+                "id": fid,
+                "fingerprint": normalized,
+                "statement": statement.decode('utf-8', 'replace'),
+                "duration_ms": seconds * 1000,
+                "route": route,
+                "user_id": user_id,
+                "captured_at": datetime.utcnow().isoformat() + 'Z',
+                "plan": plan,
+            })
@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+
+DELETED = -1
+
+class TokenGenerationCache:
+    """Bounded LRU of each user's current token generation.
+
+    Access tokens carry the generation they were issued at; a token is revoked once
+    the user's generation moves past it. Writes in this process update the cache
+    directly, and entries expire after `ttl` seconds so changes made by other
+    workers are picked up with one lookup per user per TTL rather than per request.
+
+    The cache is per process, so revocation is immediate only on the worker that handled
+    it: on every other worker a revoked token keeps working for up to `ttl` seconds
+    (TOKEN_GENERATION_CACHE_TTL). A `ttl` of 0 reads the generation on every request.
+    """
+
+    def __init__(self, loader, max_entries=10000, ttl=300):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None and cached[1] > now:
+                self._entries.move_to_end(user_id)
+                return cached[0]
+
+        generation = self.loader(user_id)
+        self.set(user_id, DELETED if generation is None else generation)
+        return DELETED if generation is None else generation
+
+    def set(self, user_id, generation):
+        with self._lock:
+            self._entries[user_id] = (generation, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, user_id, generation):
+        return generation != self.get(user_id)
@@ -0,0 +1,86 @@
+BUCKETS = ('day', 'week', 'month')
+
+# Per-user mood counts pre-aggregated by day, week and month. Entry writes keep
+# them current so /api/chart-data/ never has to re-aggregate the whole history.
+
+def apply_rollup_delta(cur, user_id, date, user_mood_id, delta):
+    if user_mood_id is None or date is None or not delta:
+        return
+
+    cur.execute("""
+        INSERT INTO mood_rollups (user_id, bucket, bucket_start, user_mood_id, entry_count)
+        SELECT %s, b.bucket, date_trunc(b.bucket, %s::date)::date, %s, %s
+        FROM unnest(%s::text[]) AS b(bucket)
+        ON CONFLICT (user_id, bucket, bucket_start, user_mood_id) DO UPDATE
+        SET entry_count = mood_rollups.entry_count + EXCLUDED.entry_count
+    """, (user_id, date, user_mood_id, delta, list(BUCKETS)))
+
+    if delta < 0:
+        cur.execute("""
+            DELETE FROM mood_rollups
+            WHERE user_id = %s AND user_mood_id = %s AND entry_count <= 0
+        """, (user_id, user_mood_id))
+
+def record_entry_change(cur, user_id, old=None, new=None):
+    """Move one entry between rollup cells. `old`/`new` are (date, user_mood_id) or None."""
+    if old == new:
+        return
+    if old:
+        apply_rollup_delta(cur, user_id, old[0], old[1], -1)
+    if new:
+        apply_rollup_delta(cur, user_id, new[0], new[1], 1)
+
+def record_entry_changes(cur, user_id, changes):
+    """Apply many (old, new) moves at once: net deltas per cell, then one upsert and one cleanup."""
+    deltas = {}
+    for old, new in changes:
+        if old == new:
+            continue
+        for cell, delta in ((old, -1), (new, 1)):
+            if cell and cell[0] is not None and cell[1] is not None:
+                deltas[cell] = deltas.get(cell, 0) + delta
+    deltas = {cell: delta for cell, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    cells = list(deltas)
+    cur.execute("""
+        INSERT INTO mood_rollups (user_id, bucket, bucket_start, user_mood_id, entry_count)
+        SELECT %s, b.bucket, date_trunc(b.bucket, d.date)::date, d.user_mood_id, sum(d.delta)
+        FROM unnest(%s::date[], %s::int[], %s::int[]) AS d(date, user_mood_id, delta)
+        CROSS JOIN unnest(%s::text[]) AS b(bucket)
+        GROUP BY 2, 3, 4
+        ON CONFLICT (user_id, bucket, bucket_start, user_mood_id) DO UPDATE
+        SET entry_count = mood_rollups.entry_count + EXCLUDED.entry_count
+    """, (user_id, [cell[0] for cell in cells], [cell[1] for cell in cells], [deltas[cell] for cell in cells],
+          list(BUCKETS)))
+
+    shrunk = sorted({cell[1] for cell, delta in deltas.items() if delta < 0})
+    if shrunk:
+        cur.execute("""
+            DELETE FROM mood_rollups
+            WHERE user_id = %s AND user_mood_id = ANY(%s) AND entry_count <= 0
+        """, (user_id, shrunk))
+
+def rebuild_rollups(cur, user_id, start_date=None, end_date=None):
+    """Recompute a user's rollups from `entries`, optionally limited to the buckets touching a date range."""
+    params = {'user_id': user_id, 'start': start_date, 'end': end_date, 'buckets': list(BUCKETS)}
+    cur.execute("""
+        DELETE FROM mood_rollups r
+        USING unnest(%(buckets)s::text[]) AS b(bucket)
+        WHERE r.user_id = %(user_id)s
+        AND r.bucket = b.bucket
+        AND (%(start)s::date IS NULL OR r.bucket_start >= date_trunc(b.bucket, %(start)s::date)::date)
+        AND (%(end)s::date IS NULL OR r.bucket_start <= date_trunc(b.bucket, %(end)s::date)::date)
+    """, params)
+    cur.execute("""
+        INSERT INTO mood_rollups (user_id, bucket, bucket_start, user_mood_id, entry_count)
+        SELECT e.user_id, b.bucket, date_trunc(b.bucket, e.date)::date, e.user_mood_id, COUNT(*)
+        FROM entries e
+        CROSS JOIN unnest(%(buckets)s::text[]) AS b(bucket)
+        WHERE e.user_id = %(user_id)s
+        AND e.user_mood_id IS NOT NULL
+        AND (%(start)s::date IS NULL OR date_trunc(b.bucket, e.date) >= date_trunc(b.bucket, %(start)s::date))
+        AND (%(end)s::date IS NULL OR date_trunc(b.bucket, e.date) <= date_trunc(b.bucket, %(end)s::date))
+        GROUP BY 1, 2, 3, 4
+    """, params)
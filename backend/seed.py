@@ -1,103 +1,222 @@
+"""Synthetic data generator.
+
+Generates users with years of journal history and bulk-loads it with COPY,
+split across worker processes by user shard. Run against a freshly created
+schema, the same --seed and --end-date produce the same users, palettes,
+entries and notes; only serial ids such as note ids depend on how the workers
+interleave. Each user has at most one entry per day, as the app's
+<user>_<date> entry ids require.
+
+Usage: python seed.py --users 1000 --years 3 --entries-per-day 0.8 --notes-per-entry 1.5 --workers 8 --end-date 2025-12-31
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import time
+from datetime import date, timedelta
+from multiprocessing import Pool
+
+import bcrypt
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import bcrypt
-from datetime import datetime, timedelta
-import uuid
-import random
+
 from config import DB_CONFIG
-from config import DB_SECRET_KEY
+from rollups import rebuild_rollups
+
+MOODS = ["Happy", "Sad", "Excited", "Calm", "Anxious", "Frustrated", "Energetic", "Tired", "Motivated", "Relaxed"]
+NAMED_USERS = ["alice", "bob", "charlie"]
+PASSWORD = "password123"
+
+WORDS = (
+    "today morning evening walked talked felt really quite little long day work home friend family coffee "
+    "rain sun dinner lunch slept woke early late tired happy calm busy quiet meeting project call read book "
+    "music run gym park city train trip weekend plan idea thought remember forgot wanted finally again better "
+    "worse good bad small big new old started finished learned noticed laughed cried worried hoped decided"
+).split()
 
 def get_db_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def generate_random_color():
-    return f"#{random.randint(0, 0xFFFFFF):06x}"
+def generate_random_color(rng):
+    return f"#{rng.randint(0, 0xFFFFFF):06x}"
 
-def seed_database():
+def generate_text(rng, mean_words, sigma=0.6):
+    # Log-normal lengths give mostly short entries with an occasional long one, like real journals
+    mu = math.log(max(mean_words, 1)) - sigma ** 2 / 2
+    count = max(1, int(rng.lognormvariate(mu, sigma)))
+    words = [rng.choice(WORDS) for _ in range(count)]
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + '.'
+
+class CopyBuffer:
+    """Accumulates CSV rows for one table and flushes them with COPY every `batch_size` rows.
+
+    `depends_on` is the buffer for the table this one references; it is flushed first,
+    so rows never reach COPY ahead of the rows their foreign keys point at.
+    """
+
+    def __init__(self, cur, table, columns, batch_size, depends_on=None):
+        self.cur = cur
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.depends_on = depends_on
+        self.rows = 0
+        self.total = 0
+        self._reset()
+
+    def _reset(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.rows = 0
+
+    def add(self, row):
+        self.writer.writerow(row)
+        self.rows += 1
+        self.total += 1
+        if self.rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.depends_on is not None:
+            self.depends_on.flush()
+        self.buffer.seek(0)
+        self.cur.copy_expert(f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)", self.buffer)
+        self._reset()
+
+def seed_shard(task):
+    """Worker: load user_moods, entries and notes for one shard of users."""
+    user_ids, mood_ids, options = task
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    started = time.perf_counter()
+    counts = {"entries": 0, "notes": 0}
 
     try:
-        # Seed users
-        users = [
-            ("alice", "password123"),
-            ("bob", "securepass456"),
-            ("charlie", "strongpass789")
-        ]
-        for username, password in users:
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            cur.execute("""
-                INSERT INTO users (username, password)
-                VALUES (%s, %s)
-                RETURNING id
-            """, (username, hashed_password))
-            user_id = cur.fetchone()['id']
-            print(f"Created user: {username} with id: {user_id}")
-
-        # Seed moods (10 moods)
-        moods = ["Happy", "Sad", "Excited", "Calm", "Anxious", "Frustrated", "Energetic", "Tired", "Motivated", "Relaxed"]
-        for mood in moods:
-            cur.execute("INSERT INTO moods (name) VALUES (%s) RETURNING id", (mood,))
-            mood_id = cur.fetchone()['id']
-            print(f"Created mood: {mood} with id: {mood_id}")
-
-        # Seed user_moods (10 moods per user)
-        cur.execute("SELECT id FROM users")
-        user_ids = [row['id'] for row in cur.fetchall()]
-        cur.execute("SELECT id FROM moods")
-        mood_ids = [row['id'] for row in cur.fetchall()]
-
-        for user_id in user_ids:
-            for mood_id in mood_ids:
-                color = generate_random_color()
-                cur.execute("""
-                    INSERT INTO user_moods (user_id, mood_id, color)
-                    VALUES (%s, %s, %s)
-                    RETURNING id
-                """, (user_id, mood_id, color))
-                user_mood_id = cur.fetchone()['id']
-                print(f"Created user_mood for user {user_id}, mood {mood_id} with id: {user_mood_id}")
-
-        # Seed entries (100 entries per user within the past 100 days)
-        current_date = datetime.now()
-        for user_id in user_ids:
-            cur.execute("SELECT id FROM user_moods WHERE user_id = %s", (user_id,))
-            user_mood_ids = [row['id'] for row in cur.fetchall()]
-
-            for i in range(100):
-                entry_id = str(uuid.uuid4())
-                date = current_date - timedelta(days=random.randint(0, 99))
-                user_mood_id = random.choice(user_mood_ids)
-                title = f"Entry {i+1} for user {user_id}"
-                image_path = f"https://picsum.photos/300/600"
-                entry_text = f"This is the text for entry {i+1} of user {user_id}. It's a longer entry to provide more substantial content for testing purposes."
-
-                cur.execute("""
-                    INSERT INTO entries (id, user_id, date, user_mood_id, title, image_path, entry_text)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (entry_id, user_id, date, user_mood_id, title, image_path, entry_text))
-                print(f"Created entry: {entry_id} for user {user_id}")
-
-                # Add 1-3 notes for each entry
-                for j in range(random.randint(1, 3)):
-                    note_text = f"This is note {j+1} for entry {entry_id}. Adding some variety to the notes for better testing."
-                    cur.execute("""
-                        INSERT INTO notes (entry_id, user_id, date, text)
-                        VALUES (%s, %s, %s, %s)
-                        RETURNING id
-                    """, (entry_id, user_id, date + timedelta(hours=j), note_text))
-                    note_id = cur.fetchone()['id']
-                    print(f"Created note: {note_id} for entry {entry_id}")
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SET synchronous_commit = off")
+            end_date = options['end_date']
+            start_date = end_date - timedelta(days=options['days'] - 1)
 
-        conn.commit()
-        print("Database seeded successfully with 10 moods per user and 100 entries per user within the past 100 days!")
+            for user_id in user_ids:
+                rng = random.Random(f"{options['seed']}:{user_id}")
+
+                palette = CopyBuffer(cur, 'user_moods', ['user_id', 'mood_id', 'color'], options['batch_size'])
+                for mood_id in mood_ids:
+                    palette.add((user_id, mood_id, generate_random_color(rng)))
+                palette.flush()
+                cur.execute("SELECT id FROM user_moods WHERE user_id = %s ORDER BY id", (user_id,))
+                user_mood_ids = [row['id'] for row in cur.fetchall()]
+
+                entries = CopyBuffer(cur, 'entries', ['id', 'user_id', 'date', 'user_mood_id', 'title', 'image_path', 'entry_text'],
+                                     options['batch_size'])
+                notes = CopyBuffer(cur, 'notes', ['entry_id', 'user_id', 'date', 'text'], options['batch_size'],
+                                   depends_on=entries)
 
-    except Exception as e:
+                for offset in range(options['days']):
+                    day = start_date + timedelta(days=offset)
+                    if rng.random() >= options['entries_per_day']:
+                        continue
+                    entry_id = f"{user_id}_{day.isoformat()}"
+                    entries.add((entry_id, user_id, day, rng.choice(user_mood_ids),
+                                 generate_text(rng, 5)[:255], None,
+                                 generate_text(rng, options['words_per_entry'])))
+                    note_count = rng.randint(0, int(options['notes_per_entry'] * 2))
+                    for _ in range(note_count):
+                        notes.add((entry_id, user_id, min(day + timedelta(days=rng.randint(0, 30)), end_date),
+                                   generate_text(rng, options['words_per_note'])))
+
+                notes.flush()
+                entries.flush()
+                counts["entries"] += entries.total
+                counts["notes"] += notes.total
+
+                rebuild_rollups(cur, user_id)
+                cur.execute("UPDATE users SET data_version = data_version + 1 WHERE id = %s", (user_id,))
+                conn.commit()
+    except Exception:
         conn.rollback()
-        print(f"An error occurred: {e}")
+        raise
     finally:
-        cur.close()
         conn.close()
 
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+def seed_database(options):
+    started = time.perf_counter()
+    rng = random.Random(options['seed'])
+    conn = get_db_connection()
+
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # One hash shared by every synthetic user; hashing thousands of passwords would dominate the run
+            hashed_password = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(options['bcrypt_rounds'])).decode('utf-8')
+            usernames = (NAMED_USERS + [f"user{n:07d}" for n in range(len(NAMED_USERS), options['users'])])[:options['users']]
+
+            users = CopyBuffer(cur, 'users', ['username', 'password'], options['batch_size'])
+            for username in usernames:
+                users.add((username, hashed_password))
+            users.flush()
+
+            cur.execute("INSERT INTO moods (name) SELECT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING", (MOODS,))
+            cur.execute("SELECT id FROM moods WHERE name = ANY(%s) ORDER BY id", (MOODS,))
+            mood_ids = [row['id'] for row in cur.fetchall()]
+            cur.execute("SELECT id FROM users WHERE username = ANY(%s) ORDER BY id", (usernames,))
+            user_ids = [row['id'] for row in cur.fetchall()]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"Created {len(user_ids)} users and {len(mood_ids)} moods")
+
+    shard_count = max(1, min(options['workers'] * 4, len(user_ids)))
+    shards = [(user_ids[i::shard_count], mood_ids, options) for i in range(shard_count)]
+    rng.shuffle(shards)
+
+    totals = {"entries": 0, "notes": 0}
+    with Pool(processes=options['workers']) as pool:
+        for done, counts in enumerate(pool.imap_unordered(seed_shard, shards), start=1):
+            totals["entries"] += counts["entries"]
+            totals["notes"] += counts["notes"]
+            print(f"Shard {done}/{shard_count}: {counts['entries']} entries, {counts['notes']} notes "
+                  f"in {counts['seconds']:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    rows = len(user_ids) * (1 + len(mood_ids)) + totals["entries"] + totals["notes"]
+    print(f"Database seeded with {len(user_ids)} users, {totals['entries']} entries and {totals['notes']} notes "
+          f"in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--years', type=float, help="Years of history per user (overrides --days)")
+    parser.add_argument('--days', type=int, default=100, help="Days of history per user")
+    parser.add_argument('--entries-per-day', type=float, default=1.0,
+                        help="Share of days with an entry, 0-1 (entry ids are <user>_<date>, so at most one a day)")
+    parser.add_argument('--notes-per-entry', type=float, default=1.0, help="Mean notes per entry")
+    parser.add_argument('--words-per-entry', type=int, default=60, help="Mean entry length in words")
+    parser.add_argument('--words-per-note', type=int, default=20, help="Mean note length in words")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=5000, help="Rows per COPY")
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(),
+                        help="Last day of generated history, YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+    if not 0 <= args.entries_per_day <= 1:
+        parser.error("--entries-per-day must be between 0 and 1")
+
+    options = vars(args)
+    if args.years:
+        options['days'] = int(args.years * 365)
+    seed_database(options)
+
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    main()
@@ -0,0 +1,49 @@
+import decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it the app keeps Flask's default provider
+    orjson = None
+
+# Non-string keys (palettes are keyed by user_mood_id) are written as strings, like json.dumps does
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_NON_STR_KEYS
+
+def _default(value):
+    # orjson already handles date, datetime, UUID and dataclasses; these are the remaining
+    # types Flask's provider accepted
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson.
+
+    Dates and datetimes are written as ISO 8601 rather than Flask's HTTP-date strings;
+    both parse the same with JavaScript's Date. response() serializes straight to bytes
+    instead of going through a str.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS),
+                                        mimetype='application/json')
+
+def init_json(app, serializer):
+    """Install the configured serializer: 'orjson' (falls back to Flask's if it isn't installed) or 'default'."""
+    if serializer == 'orjson':
+        if orjson is None:
+            app.logger.warning("orjson is not installed; using Flask's default JSON provider")
+        else:
+            app.json = OrjsonProvider(app)
+    elif serializer != 'default':
+        raise ValueError(f"Unknown JSON serializer {serializer!r}")
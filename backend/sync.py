@@ -0,0 +1,111 @@
+# Delta sync: every row in entries, notes and user_moods carries the change_seq of its
+# last write, and deletes leave a tombstone in `deletions` numbered from the same
+# sequence. A client keeps the highest seq it has applied and asks for what came after.
+# Tombstones are pruned after a retention period (tombstone_gc.py), which raises the
+# user's sync_floor; a client whose seq is below it has missed deletes and must resync.
+
+class SyncCursorExpired(Exception):
+    def __init__(self, min_seq):
+        super().__init__("since is older than the retained change history; resync from since=0")
+        self.min_seq = min_seq
+
+SYNC_ENTRY_COLUMNS = ("id, date, user_mood_id, title, image_path, image_variants, entry_text, "
+                      "change_seq AS seq, updated_at")
+
+def fetch_changes(cur, user_id, since, limit):
+    """One page of changes after `since`, in sequence order.
+
+    Returns (changes, last_seq, has_more), or raises SyncCursorExpired when `since` is
+    nonzero but below the user's sync_floor. The page boundary is chosen over the merged
+    sequence of all four sources first, so each index is read in seq order and stops
+    early; full rows are then fetched only for the ids on the page.
+    """
+    # One snapshot for the page boundary and the rows it names
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    if since:
+        cur.execute("SELECT sync_floor FROM users WHERE id = %s", (user_id,))
+        row = cur.fetchone()
+        if row and since < row['sync_floor']:
+            raise SyncCursorExpired(row['sync_floor'])
+    cur.execute("""
+        SELECT seq, kind, row_id FROM (
+            (SELECT change_seq AS seq, 'entry' AS kind, id AS row_id FROM entries
+             WHERE user_id = %(user_id)s AND change_seq > %(since)s ORDER BY change_seq LIMIT %(limit)s)
+            UNION ALL
+            (SELECT change_seq, 'note', id::text FROM notes
+             WHERE user_id = %(user_id)s AND change_seq > %(since)s ORDER BY change_seq LIMIT %(limit)s)
+            UNION ALL
+            (SELECT change_seq, 'user_mood', id::text FROM user_moods
+             WHERE user_id = %(user_id)s AND change_seq > %(since)s ORDER BY change_seq LIMIT %(limit)s)
+            UNION ALL
+            (SELECT seq, 'deleted', kind || ':' || row_id FROM deletions
+             WHERE user_id = %(user_id)s AND seq > %(since)s ORDER BY seq LIMIT %(limit)s)
+        ) changed
+        ORDER BY seq
+        LIMIT %(limit)s
+    """, {'user_id': user_id, 'since': since, 'limit': limit + 1})
+    page = cur.fetchall()
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    ids = {'entry': [], 'note': [], 'user_mood': []}
+    deleted = []
+    for row in page:
+        if row['kind'] == 'deleted':
+            kind, row_id = row['row_id'].split(':', 1)
+            deleted.append({"type": kind, "id": int(row_id) if kind != 'entry' else row_id, "seq": row['seq']})
+        else:
+            ids[row['kind']].append(row['row_id'])
+
+    changes = {"entries": [], "notes": [], "user_moods": [], "deleted": deleted}
+    if ids['entry']:
+        cur.execute(f"""
+            SELECT {SYNC_ENTRY_COLUMNS} FROM entries
+            WHERE user_id = %s AND id = ANY(%s) ORDER BY change_seq
+        """, (user_id, ids['entry']))
+        changes["entries"] = cur.fetchall()
+    if ids['note']:
+        cur.execute("""
+            SELECT id, entry_id, date, text, change_seq AS seq, updated_at FROM notes
+            WHERE user_id = %s AND id = ANY(%s::int[]) ORDER BY change_seq
+        """, (user_id, ids['note']))
+        changes["notes"] = cur.fetchall()
+    if ids['user_mood']:
+        cur.execute("""
+            SELECT user_moods.id, user_moods.mood_id, moods.name, user_moods.color,
+                user_moods.change_seq AS seq, user_moods.updated_at
+            FROM user_moods
+            JOIN moods ON user_moods.mood_id = moods.id
+            WHERE user_moods.user_id = %s AND user_moods.id = ANY(%s::int[]) ORDER BY user_moods.change_seq
+        """, (user_id, ids['user_mood']))
+        changes["user_moods"] = cur.fetchall()
+
+    last_seq = page[-1]['seq'] if page else since
+    return changes, last_seq, has_more
+
+def prune_tombstones(cur, retention_days, batch_size):
+    """Delete up to `batch_size` tombstones older than the retention period.
+
+    Each user's sync_floor is raised to the highest seq pruned for them in the same
+    statement, so /api/sync never serves a page that silently misses a delete.
+    Returns the number of tombstones removed.
+    """
+    cur.execute("""
+        WITH pruned AS (
+            DELETE FROM deletions
+            WHERE seq IN (
+                SELECT seq FROM deletions
+                WHERE deleted_at < now() - make_interval(days => %s)
+                ORDER BY deleted_at
+                LIMIT %s
+            )
+            RETURNING user_id, seq
+        ),
+        floors AS (
+            UPDATE users SET sync_floor = GREATEST(users.sync_floor, per_user.max_seq)
+            FROM (SELECT user_id, max(seq) AS max_seq FROM pruned GROUP BY user_id) per_user
+            WHERE users.id = per_user.user_id
+        )
+        SELECT count(*) AS pruned FROM pruned
+    """, (retention_days, batch_size))
+    return cur.fetchone()['pruned']
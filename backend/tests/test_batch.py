@@ -0,0 +1,123 @@
+import json
+from datetime import date
+
+import pytest
+
+from batch import BatchError, apply_batch, validate_operations
+from rollups import record_entry_changes
+
+USER = 7
+
+
+def upsert(day, mood, **extra):
+    return {'op': 'upsert_entry', 'date': day, 'user_mood_id': mood, 'title': 'Title', 'entry_text': 'Text', **extra}
+
+
+class FakeCursor:
+    """Just enough of entries, idempotency_keys and mood_rollups for apply_batch()."""
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self.keys = {}
+        self.rollup_deltas = []
+        self.statements = []
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self.rows = []
+        if 'INSERT INTO idempotency_keys' in sql:
+            fresh = [key for key in params[1] if key not in self.keys]
+            self.keys.update((key, None) for key in fresh)
+            self.rows = [{'key': key} for key in fresh]
+        elif 'SELECT key, result FROM idempotency_keys' in sql:
+            self.rows = [{'key': key, 'result': self.keys[key]} for key in params[1]]
+        elif 'UPDATE idempotency_keys' in sql:
+            for key, result in zip(params[0], params[1]):
+                self.keys[key] = json.loads(result)
+        elif 'FROM entries WHERE id = ANY' in sql:
+            self.rows = [{'id': entry_id, 'date': self.entries[entry_id][0], 'user_mood_id': self.entries[entry_id][1]}
+                         for entry_id in params[0] if entry_id in self.entries]
+        elif 'INSERT INTO entries' in sql:
+            _, ids, dates, moods, _, _ = params
+            for entry_id, day, mood in zip(ids, dates, moods):
+                self.entries[entry_id] = (date.fromisoformat(day), mood)
+                self.rows.append({'id': entry_id, 'date': date.fromisoformat(day), 'user_mood_id': mood})
+        elif 'INSERT INTO mood_rollups' in sql:
+            self.rollup_deltas.append(sorted(zip(params[1], params[2], params[3])))
+
+    def fetchall(self):
+        return self.rows
+
+    def count(self, fragment):
+        return sum(fragment in sql for sql in self.statements)
+
+
+@pytest.mark.parametrize('operation, message', [
+    ({'op': 'delete_note', 'note_id': True}, "note_id must be a positive integer"),
+    ({'op': 'delete_note', 'note_id': '3'}, "note_id must be a positive integer"),
+    ({'op': 'delete_entry', 'entry_id': 5}, "entry_id must be a non-empty string"),
+    ({'op': 'update_note', 'note_id': 3, 'text': None}, "text must be a string"),
+    ({'op': 'create_note', 'entry_id': '7_2024-01-01', 'date': 20240101, 'text': 'x'}, "date must be an ISO date"),
+    (upsert('2024-02-30', 1), "date must be a YYYY-MM-DD string"),
+    (upsert('20240101', 1), "date must be a YYYY-MM-DD string"),
+    (upsert('2024-01-01', True), "user_mood_id must be an integer or null"),
+    (upsert('2024-01-01', 1, title=''), "title must be a string"),
+    (upsert('2024-01-01', 1, entry_text=['x']), "entry_text must be a string"),
+    ({'op': 'rename_entry'}, "op must be one of"),
+    ({'op': 'delete_note'}, "Missing required fields"),
+])
+def test_invalid_operations_are_rejected(operation, message):
+    with pytest.raises(BatchError, match=message) as excinfo:
+        validate_operations([upsert('2024-01-01', 1), operation], 10)
+    assert excinfo.value.index == 1
+
+
+def test_valid_operations_pass():
+    validate_operations([
+        upsert('2024-01-01', None, key='a'),
+        {'op': 'create_note', 'entry_id': '7_2024-01-01', 'date': '2024-01-01T09:30:00Z', 'text': ''},
+        {'op': 'update_note', 'note_id': 3, 'text': 'edited', 'key': 'b'},
+        {'op': 'delete_entry', 'entry_id': '7_2024-01-02'},
+    ], 10)
+
+
+def test_batch_size_and_duplicate_keys_are_checked():
+    with pytest.raises(BatchError, match="At most 1 operations"):
+        validate_operations([upsert('2024-01-01', 1), upsert('2024-01-02', 1)], 1)
+    with pytest.raises(BatchError, match="Duplicate idempotency key") as excinfo:
+        validate_operations([upsert('2024-01-01', 1, key='k'), upsert('2024-01-02', 1, key='k')], 10)
+    assert excinfo.value.index == 1
+
+
+def test_keyed_operation_replays_instead_of_reapplying():
+    cur = FakeCursor()
+    operations = [upsert('2024-01-01', 1, key='k1')]
+
+    first, applied = apply_batch(cur, USER, operations, 7)
+    second, replayed = apply_batch(cur, USER, operations, 7)
+
+    assert first == [{'entry_id': '7_2024-01-01', 'status': 'applied'}]
+    assert applied == {'upsert_entry'}
+    assert second == [{'entry_id': '7_2024-01-01', 'status': 'replayed'}]
+    assert replayed == set()
+    assert cur.count('INSERT INTO entries') == 1
+    assert cur.count('INSERT INTO mood_rollups') == 1
+
+
+def test_repeated_upserts_of_one_date_net_to_a_single_move():
+    day = date(2024, 1, 1)
+    cur = FakeCursor(entries={'7_2024-01-01': (day, 1)})
+
+    results, _ = apply_batch(cur, USER, [upsert('2024-01-01', 2), upsert('2024-01-01', 3)], 7)
+
+    assert [result['entry_id'] for result in results] == ['7_2024-01-01', '7_2024-01-01']
+    assert cur.entries['7_2024-01-01'] == (day, 3)
+    assert cur.rollup_deltas == [[(day, 1, -1), (day, 3, 1)]]
+
+
+def test_moves_that_cancel_out_write_nothing():
+    cur = FakeCursor()
+    day = date(2024, 1, 1)
+    record_entry_changes(cur, USER, [((day, 1), (day, 2)), ((day, 2), (day, 1)), ((day, 3), (day, 3))])
+    assert cur.statements == []
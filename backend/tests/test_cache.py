@@ -0,0 +1,50 @@
+import cache
+from cache import ResponseCache
+
+
+def key(user_id, name):
+    return (user_id, 'entries', (), name, 1)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    responses = ResponseCache(max_bytes=10, ttl=60)
+    responses.set(key('alice', 'a'), b'aaaa', 200, 'application/json')
+    responses.set(key('alice', 'b'), b'bbbb', 200, 'application/json')
+    assert responses.get(key('alice', 'a')) is not None
+
+    responses.set(key('alice', 'c'), b'cccc', 200, 'application/json')
+
+    assert responses.get(key('alice', 'b')) is None
+    assert responses.get(key('alice', 'a')).body == b'aaaa'
+    assert responses.stats()["evictions"] == 1
+    assert responses.stats()["bytes"] == 8
+
+
+def test_oversized_body_is_not_cached():
+    responses = ResponseCache(max_bytes=4, ttl=60)
+    responses.set(key('alice', 'a'), b'too big', 200, 'application/json')
+    assert responses.stats()["entries"] == 0
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    responses = ResponseCache(max_bytes=100, ttl=30)
+    responses.set(key('alice', 'a'), b'body', 200, 'application/json')
+
+    now[0] += 29
+    assert responses.get(key('alice', 'a')) is not None
+    now[0] += 1
+    assert responses.get(key('alice', 'a')) is None
+    assert responses.stats()["bytes"] == 0
+
+
+def test_invalidate_only_touches_that_user():
+    responses = ResponseCache(max_bytes=100, ttl=60)
+    responses.set(key('alice', 'a'), b'a', 200, 'application/json')
+    responses.set(key('bob', 'a'), b'b', 200, 'application/json')
+
+    responses.invalidate('alice')
+
+    assert responses.get(key('alice', 'a')) is None
+    assert responses.get(key('bob', 'a')) is not None
@@ -0,0 +1,56 @@
+import gzip
+import zlib
+
+from flask import Flask, Response
+
+from compression import ResponseCompressor, _GzipStream, compress_stream
+
+app = Flask(__name__)
+BODY = b'{"entries": [' + b'{"title": "A calm day"},' * 200 + b'{}]}'
+
+
+def compress(response, accept_encoding='gzip', **options):
+    with app.test_request_context(headers={'Accept-Encoding': accept_encoding}):
+        return ResponseCompressor(algorithms=('gzip',), **options).compress_response(response)
+
+
+def test_json_body_is_gzipped_and_etag_weakened():
+    response = Response(BODY, mimetype='application/json')
+    response.set_etag('v1')
+
+    response = compress(response)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == BODY
+    assert response.get_etag() == ('v1', True)
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_small_and_unaccepted_bodies_are_left_alone():
+    small = compress(Response(b'{}', mimetype='application/json'))
+    assert 'Content-Encoding' not in small.headers
+
+    refused = compress(Response(BODY, mimetype='application/json'), accept_encoding='identity')
+    assert 'Content-Encoding' not in refused.headers
+    assert refused.get_data() == BODY
+
+
+def test_non_text_response_is_not_compressed():
+    response = compress(Response(BODY, mimetype='image/png'))
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_stream_compresses_each_chunk_and_closes_the_source():
+    closed = []
+
+    def rows():
+        try:
+            for i in range(500):
+                yield f'{{"row": {i}}}\n'
+        finally:
+            closed.append(True)
+
+    out = b''.join(compress_stream(rows(), _GzipStream(6)))
+
+    assert zlib.decompress(out, 16 + zlib.MAX_WBITS) == ''.join(f'{{"row": {i}}}\n' for i in range(500)).encode()
+    assert closed == [True]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions
+
+from db_pool import ConnectionPool, PoolError, PoolExhausted, PoolTimeout, _PooledConnection
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePool(ConnectionPool):
+    def _connect(self):
+        return _PooledConnection(FakeConnection())
+
+
+def test_connections_are_reused():
+    pool = FakePool(None, minconn=1, maxconn=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert pool.stats()["total"] == 1
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool = FakePool(None, minconn=0, maxconn=1, timeout=0.05)
+    pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_receives_connection_returned_by_another_thread():
+    pool = FakePool(None, minconn=0, maxconn=1, timeout=5)
+    held = pool.getconn()
+    received = []
+    waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+    waiter.start()
+
+    while pool.stats()["waiting"] == 0:
+        time.sleep(0.001)
+    pool.putconn(held)
+    waiter.join(timeout=5)
+
+    assert received == [held]
+    assert pool.stats()["total"] == 1
+
+
+def test_waiters_beyond_the_limit_are_rejected():
+    pool = FakePool(None, minconn=0, maxconn=1, timeout=5, max_waiters=0)
+    pool.getconn()
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+    assert pool.stats()["rejections"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool = FakePool(None, minconn=0, maxconn=1)
+    conn = pool.getconn()
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_expired_connection_is_replaced():
+    pool = FakePool(None, minconn=0, maxconn=1, max_lifetime=0.01)
+    conn = pool.getconn()
+    time.sleep(0.02)
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.stats()["recycled"] == 1
+    assert pool.getconn() is not conn
+
+
+def test_closed_pool_refuses_checkouts():
+    pool = FakePool(None, minconn=1, maxconn=1)
+    pool.closeall()
+    with pytest.raises(PoolError):
+        pool.getconn()
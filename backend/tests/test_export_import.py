@@ -0,0 +1,92 @@
+import io
+from datetime import date
+
+import pytest
+
+import exporter
+import importer
+
+ROWS = {
+    'users': [{"id": 7, "username": "alice"}],
+    'user_moods': [{"name": "Calm", "color": "#00ff00"}, {"name": "Happy", "color": "#ffcc00"}],
+    'entries': [
+        {"id": "7_2024-01-01", "date": date(2024, 1, 1), "title": "New year", "entry_text": "Quiet start.",
+         "image_path": None, "image_variants": None, "mood": "Calm", "color": "#00ff00"},
+        {"id": "7_2024-01-02", "date": date(2024, 1, 2), "title": "Back to work", "entry_text": "Busy.",
+         "image_path": "/static/uploads/abc.jpg", "image_variants": {"hash": "abc"}, "mood": "Happy", "color": "#ffcc00"},
+    ],
+    'notes': [{"entry_date": date(2024, 1, 1), "date": date(2024, 1, 3), "text": "Still calm."}],
+}
+
+class FakeCursor:
+    """Answers exporter's queries from ROWS, keyed by the table after FROM."""
+
+    def __init__(self):
+        self.rows = []
+        self.itersize = None
+
+    def execute(self, sql, params=None):
+        table = sql.split('FROM', 1)[1].split()[0] if 'FROM' in sql else None
+        self.rows = list(ROWS.get(table, []))
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class FakeConnection:
+    def cursor(self, *args, **kwargs):
+        return FakeCursor()
+
+def stage(text):
+    spools = {'entries': importer._Spool(), 'notes': importer._Spool(), 'moods': importer._Spool()}
+    for line_no, record in importer.parse_records(io.StringIO(text), 'ndjson'):
+        importer._stage_record(record, line_no, spools)
+    staged = {}
+    for name, spool in spools.items():
+        spool.file.seek(0)
+        staged[name] = spool.file.read().splitlines()
+        spool.close()
+    return staged
+
+def test_export_can_be_reimported():
+    exported = ''.join(exporter.stream_ndjson(FakeConnection(), 7))
+    assert exported.splitlines()[0].startswith('{"type":"user"')
+
+    staged = stage(exported)
+
+    assert staged['moods'] == ['Calm,#00ff00', 'Happy,#ffcc00']
+    assert [row.split(',')[1:4] for row in staged['entries']] == [
+        ['2024-01-01', 'New year', 'Quiet start.'],
+        ['2024-01-02', 'Back to work', 'Busy.'],
+    ]
+    assert staged['notes'] == ['2024-01-01,2024-01-03,Still calm.']
+
+def test_unknown_record_type_is_rejected():
+    with pytest.raises(importer.JournalImportError, match="unknown record type"):
+        stage('{"type": "photo"}\n')
+
+@pytest.mark.parametrize('text, message', [
+    ('{"date": "2024-01-01", "title": "Ok"}\n[1, 2]\n', "Line 2: expected a JSON object"),
+    ('"just a string"\n', "Line 1: expected a JSON object"),
+    ('{"date": "2024-01-01", "title": "Ok", "notes": "[not json"}\n', "Line 1: invalid JSON in notes"),
+    ('{"date": "2024-01-01", "title": "Ok", "notes": {"text": "hi"}}\n', "Line 1: notes must be a list"),
+    ('{"date": "2024-01-01", "title": "Ok", "notes": [3]}\n', "Line 1: each note must be"),
+])
+def test_malformed_records_are_rejected_with_line_number(text, message):
+    with pytest.raises(importer.JournalImportError, match=message):
+        stage(text)
+
+def test_csv_notes_with_bad_json_are_rejected():
+    text = 'date,title,entry_text,notes\n2024-01-01,Ok,,"[oops"\n'
+    spools = {'entries': importer._Spool(), 'notes': importer._Spool(), 'moods': importer._Spool()}
+    with pytest.raises(importer.JournalImportError, match="Line 2: invalid JSON in notes"):
+        for line_no, record in importer.parse_records(io.StringIO(text), 'csv'):
+            importer._stage_record(record, line_no, spools)
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+
+import pytest
+
+from insights import MAX_SPAN_DAYS, ROLLING_WINDOWS, mood_insights, parse_range
+
+TODAY = date(2024, 6, 15)
+
+
+class FakeCursor:
+    """Answers each insights query with canned rows, picked by a fragment of its SQL."""
+
+    def __init__(self, runs=(), rolling=()):
+        self.answers = {'length, is_longest, is_current': list(runs), 'share_7': list(rolling),
+                        'SELECT count(*) AS days FROM in_range': [{'days': 3}]}
+        self.params = []
+        self.rows = []
+
+    def execute(self, sql, params):
+        self.params.append(params)
+        self.rows = next((rows for fragment, rows in self.answers.items() if fragment in sql), [])
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+
+def run(mood, start, end, longest=True, current=False):
+    return {'user_mood_id': mood, 'start_date': start, 'end_date': end, 'length': (end - start).days + 1,
+            'is_longest': longest, 'is_current': current}
+
+
+def test_default_range_is_the_year_ending_today():
+    assert parse_range(None, None, TODAY) == (TODAY - timedelta(days=364), TODAY)
+
+
+@pytest.mark.parametrize('start, end, message', [
+    ('2024-06-15', '2024-06-14', "must not be after"),
+    ('2020-01-01', '2024-06-15', f"limited to {MAX_SPAN_DAYS} days"),
+    ('yesterday', None, "YYYY-MM-DD"),
+])
+def test_bad_ranges_are_rejected(start, end, message):
+    with pytest.raises(ValueError, match=message):
+        parse_range(start, end, TODAY)
+
+
+@pytest.mark.parametrize('last_day, is_current', [
+    (TODAY, True),
+    (TODAY - timedelta(days=1), True),
+    (TODAY - timedelta(days=2), False),
+    (TODAY - timedelta(days=90), False),
+])
+def test_current_streak_must_reach_today_or_yesterday(last_day, is_current):
+    cur = FakeCursor(runs=[run(1, last_day - timedelta(days=4), last_day, current=True)])
+    streaks = mood_insights(cur, 1, TODAY - timedelta(days=364), TODAY, {}, TODAY)["streaks"]
+
+    assert streaks["longest"][1]["length"] == 5
+    if is_current:
+        assert streaks["current"]["length"] == 5
+        assert streaks["current"]["end_date"] == last_day
+    else:
+        assert streaks["current"] == {"user_mood_id": None, "start_date": None, "end_date": None, "length": 0}
+
+
+def test_rolling_windows_warm_up_before_the_range_and_report_only_its_days():
+    start = date(2024, 6, 1)
+    warmup_start = start - timedelta(days=max(ROLLING_WINDOWS) - 1)
+    days = [warmup_start + timedelta(days=n) for n in range((TODAY - warmup_start).days + 1)]
+    rows = [{'day': day, 'user_mood_id': mood, 'share_7': 0.5, 'share_30': 0.25} for day in days for mood in (1, 2)]
+    cur = FakeCursor(rolling=rows)
+
+    rolling = mood_insights(cur, 1, start, TODAY, {2: {}, 1: {}}, TODAY)["rolling"]
+
+    assert all(params['warmup_start'] == warmup_start for params in cur.params)
+    assert rolling["dates"][0] == start
+    assert rolling["dates"][-1] == TODAY
+    assert len(rolling["dates"]) == 15
+    assert rolling["share_7"][1] == [0.5] * 15
+    assert rolling["share_30"][2] == [0.25] * 15
+    assert cur.params[-1]['moods'] == [1, 2]
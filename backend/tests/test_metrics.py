@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+
+pytest.importorskip('prometheus_client')
+
+from metrics import Metrics
+
+
+class FakeStats:
+    def stats(self):
+        return {'in_use': 0, 'idle': 1, 'total': 1, 'waiting': 0, 'max_connections': 2, 'checkouts': 3,
+                'timeouts': 0, 'rejections': 0, 'recycled': 0, 'broken': 0, 'hits': 1, 'misses': 1,
+                'evictions': 0, 'invalidations': 0, 'entries': 1, 'bytes': 10, 'max_inflight': 4}
+
+
+def make_app(token):
+    app = Flask(__name__)
+    Metrics().init_app(app, FakeStats(), FakeStats(), FakeStats(), token=token)
+    return app.test_client()
+
+
+def test_scrape_needs_the_bearer_token():
+    client = make_app('s3cret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert b'ebb_db_pool_in_use' in response.data
+
+
+def test_metrics_route_is_not_registered_without_a_token():
+    assert make_app('').get('/metrics').status_code == 404
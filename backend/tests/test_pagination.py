@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, parse_limit
+
+ENTRY_KEY = (date.fromisoformat, str)
+
+
+def test_date_key_is_parsed_back_to_a_date():
+    token = encode_cursor(date(2024, 2, 29), 'alice_2024-02-29')
+    assert decode_cursor(token, 2, ENTRY_KEY) == [date(2024, 2, 29), 'alice_2024-02-29']
+
+
+@pytest.mark.parametrize('key', [
+    ('2024-02-30', 'alice_2024-02-30'),
+    ('not-a-date', 'alice'),
+    (20240101, 'alice'),
+    (None, 'alice'),
+])
+def test_cursor_with_bad_date_is_rejected(key):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(encode_cursor(*key), 2, ENTRY_KEY)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(0.25, 'alice_2024-01-01')
+    assert decode_cursor(token, 2) == [0.25, 'alice_2024-01-01']
+
+
+@pytest.mark.parametrize('token', ['not base64!', 'e30=', encode_cursor('only-one')])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(token, 2)
+
+
+@pytest.mark.parametrize('raw, expected', [(None, 20), ('5', 5), ('500', 100)])
+def test_limit_defaults_and_caps(raw, expected):
+    assert parse_limit(raw, 20, 100) == expected
+
+
+@pytest.mark.parametrize('raw', ['0', '-1', 'ten'])
+def test_bad_limit_is_rejected(raw):
+    with pytest.raises(ValueError):
+        parse_limit(raw, 20, 100)
@@ -0,0 +1,35 @@
+import pytest
+
+from projection import PREVIEW_DEFAULT, SUMMARY_FIELDS, entry_select, parse_projection
+
+
+def test_fields_keep_request_order_after_the_key_columns():
+    names, length = parse_projection('title, mood_color,title', None, None)
+    assert names == ('id', 'date', 'title', 'mood_color')
+    assert length == PREVIEW_DEFAULT
+
+
+def test_summary_view():
+    names, _ = parse_projection(None, 'summary', '40')
+    assert names == SUMMARY_FIELDS
+
+
+@pytest.mark.parametrize('fields, view, preview', [
+    ('title,password', None, None),
+    (None, 'everything', None),
+    (None, None, 'long'),
+    (None, None, '0'),
+])
+def test_bad_projection_is_rejected(fields, view, preview):
+    with pytest.raises(ValueError):
+        parse_projection(fields, view, preview)
+
+
+def test_mood_tables_are_joined_only_when_needed():
+    columns, joins = entry_select(('id', 'date', 'title'), 120)
+    assert columns == "entries.id AS id, entries.date AS date, entries.title AS title"
+    assert joins == ''
+
+    columns, joins = entry_select(('id', 'preview', 'mood_name'), 80)
+    assert "left(entries.entry_text, 80)" in columns
+    assert "JOIN moods" in joins
@@ -0,0 +1,104 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from query_tracer import QueryTracer, _explainable, fingerprint, fingerprint_id
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("SELECT * FROM entries WHERE id = 'alice_2024-01-01' AND user_id = 42",
+     "select * from entries where id = ? and user_id = ?"),
+    ("SELECT 1 FROM notes WHERE text = 'it''s' -- trailing\n", "select ? from notes where text = ?"),
+    ("SELECT  a /* hint */ FROM t WHERE x IN (%s, %s, %s)", "select a from t where x in (?+)"),
+    ("SELECT a FROM t WHERE x = %(user_id)s AND y = 1.5", "select a from t where x = ? and y = ?"),
+    (b"FETCH 100 FROM stream_0123456789abcdef0123456789abcdef", "fetch ? from stream_?"),
+])
+def test_fingerprint_normalizes_literals_and_whitespace(sql, expected):
+    assert fingerprint(sql) == expected
+
+
+def test_fingerprint_id_is_stable():
+    assert fingerprint_id("select ?") == fingerprint_id(fingerprint("SELECT 7"))
+    assert len(fingerprint_id("select ?")) == 12
+
+
+@pytest.mark.parametrize('sql, explainable', [
+    ("SELECT * FROM entries", True),
+    ("WITH q AS (SELECT 1) SELECT * FROM q", True),
+    ("SELECT id FROM entries WHERE id = ? FOR UPDATE", False),
+    ("WITH moved AS (DELETE FROM notes RETURNING id) SELECT * FROM moved", False),
+    ("SELECT nextval(pg_get_serial_sequence(?, ?))", False),
+    ("UPDATE users SET data_version = data_version + ?", False),
+    ("INSERT INTO notes VALUES (?)", False),
+])
+def test_only_plain_reads_are_explainable(sql, explainable):
+    assert _explainable(fingerprint(sql)) == explainable
+
+
+class RequestCursor:
+    name = None
+
+    def mogrify(self, sql, params):
+        return (sql % params).encode('utf-8')
+
+
+class ExplainCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append(sql)
+
+    def fetchall(self):
+        return [("Seq Scan on entries",)]
+
+
+class ExplainConnection:
+    def __init__(self):
+        self.statements = []
+        self.thread = None
+        self.done = threading.Event()
+
+    def cursor(self):
+        self.thread = threading.current_thread()
+        return ExplainCursor(self.statements)
+
+    def rollback(self):
+        self.done.set()
+
+
+def test_slow_read_is_explained_off_the_request_thread():
+    conn = ExplainConnection()
+
+    @contextmanager
+    def explain_connection():
+        yield conn
+
+    tracer = QueryTracer(logging.getLogger('test'), lambda: ('/api/entries', 1), threshold_ms=10,
+                         sample_rate=1, explain_connection=explain_connection)
+    try:
+        tracer.on_query("SELECT * FROM entries WHERE user_id = %s", (1,), 0.5, RequestCursor())
+        assert conn.done.wait(5)
+    finally:
+        tracer.shutdown()
+
+    assert conn.thread is not threading.current_thread()
+    assert conn.statements[0] == "SET TRANSACTION READ ONLY"
+    assert conn.statements[-1] == b"EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM entries WHERE user_id = 1"
+    assert tracer.plans()[0]["plan"] == "Seq Scan on entries"
+    assert tracer.stats()[0]["slow"] == 1
+
+
+def test_without_an_explain_connection_slow_queries_are_only_logged():
+    tracer = QueryTracer(logging.getLogger('test'), lambda: (None, None), threshold_ms=10, sample_rate=1)
+    tracer.on_query("SELECT 1", None, 0.5, RequestCursor())
+    assert tracer.plans() == []
+    assert tracer.stats()[0]["slow"] == 1
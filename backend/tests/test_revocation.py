@@ -0,0 +1,55 @@
+import revocation
+from revocation import DELETED, TokenGenerationCache
+
+
+class Loader:
+    def __init__(self, generations):
+        self.generations = generations
+        self.calls = 0
+
+    def __call__(self, user_id):
+        self.calls += 1
+        return self.generations.get(user_id)
+
+
+def test_generation_is_loaded_once_per_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(revocation.time, 'monotonic', lambda: now[0])
+    loader = Loader({1: 3})
+    cache = TokenGenerationCache(loader, ttl=300)
+
+    assert not cache.is_revoked(1, 3)
+    assert cache.is_revoked(1, 2)
+    assert loader.calls == 1
+
+    # Another worker bumps the generation; this process only notices once the entry expires
+    loader.generations[1] = 4
+    now[0] += 299
+    assert not cache.is_revoked(1, 3)
+    now[0] += 1
+    assert cache.is_revoked(1, 3)
+    assert loader.calls == 2
+
+
+def test_local_revocation_is_immediate():
+    cache = TokenGenerationCache(Loader({1: 3}), ttl=300)
+    assert not cache.is_revoked(1, 3)
+    cache.set(1, 4)
+    assert cache.is_revoked(1, 3)
+
+
+def test_zero_ttl_reads_through_every_time():
+    loader = Loader({1: 3})
+    cache = TokenGenerationCache(loader, ttl=0)
+    cache.get(1)
+    cache.get(1)
+    assert loader.calls == 2
+
+
+def test_missing_user_is_revoked_and_cache_is_bounded():
+    cache = TokenGenerationCache(Loader({1: 0, 2: 0, 3: 0}), max_entries=2)
+    assert cache.get(99) == DELETED
+    assert cache.is_revoked(99, 0)
+    for user_id in (1, 2, 3):
+        cache.get(user_id)
+    assert list(cache._entries) == [2, 3]
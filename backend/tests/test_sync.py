@@ -0,0 +1,62 @@
+import pytest
+
+import sync
+import tombstone_gc
+
+
+class FakeCursor:
+    def __init__(self, sync_floor=0, pruned=()):
+        self.sync_floor = sync_floor
+        self.pruned = list(pruned)
+        self.row = None
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if 'sync_floor FROM users' in sql:
+            self.row = {'sync_floor': self.sync_floor}
+        elif 'DELETE FROM deletions' in sql:
+            self.row = {'pruned': self.pruned.pop(0)}
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, cur):
+        self.cur = cur
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_cursor_below_floor_is_expired():
+    with pytest.raises(sync.SyncCursorExpired) as excinfo:
+        sync.fetch_changes(FakeCursor(sync_floor=500), 1, 499, 100)
+    assert excinfo.value.min_seq == 500
+
+
+@pytest.mark.parametrize('since', [0, 500, 501])
+def test_full_sync_and_cursors_at_or_above_floor_are_served(since):
+    changes, last_seq, has_more = sync.fetch_changes(FakeCursor(sync_floor=500), 1, since, 100)
+    assert last_seq == since
+    assert not has_more
+
+
+def test_prune_runs_in_committed_batches_until_a_short_one():
+    conn = FakeConnection(FakeCursor(pruned=[10, 10, 3]))
+    assert tombstone_gc.collect_tombstones(conn, retention_days=30, batch_size=10) == 23
+    assert conn.commits == 3
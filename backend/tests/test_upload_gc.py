@@ -0,0 +1,72 @@
+import os
+import time
+
+import upload_gc
+
+
+class FakeCursor:
+    def __init__(self, referenced):
+        self.referenced = referenced
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.rows = [{'name': name} for name in params[0] if name in self.referenced]
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, referenced=()):
+        self.referenced = set(referenced)
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.referenced)
+
+    def rollback(self):
+        pass
+
+
+def make_files(folder, names, age=7200):
+    old = time.time() - age
+    for name in names:
+        path = folder / name
+        path.write_bytes(b'x')
+        os.utime(path, (old, old))
+
+
+def test_capped_runs_resume_from_checkpoint(tmp_path):
+    make_files(tmp_path, ['a.png', 'b.png', 'c.png', 'd.png', 'e.png'])
+    conn = FakeConnection(referenced={'b.png'})
+    checkpoint = str(tmp_path.parent / 'checkpoint')
+
+    scanned = []
+    for _ in range(3):
+        start_after = upload_gc.read_checkpoint(checkpoint)
+        report = upload_gc.collect_orphans(conn, str(tmp_path), batch_size=1, max_files=2,
+                                           start_after=start_after, log=lambda msg: None)
+        upload_gc.write_checkpoint(report['resume_after'], checkpoint)
+        scanned.append(report['scanned'])
+
+    assert scanned == [2, 2, 1]
+    assert sorted(os.listdir(tmp_path)) == ['b.png']
+    # The last run reached the end of the folder, so the next one starts over
+    assert upload_gc.read_checkpoint(checkpoint) is None
+
+
+def test_recent_files_are_kept(tmp_path):
+    make_files(tmp_path, ['old.png'])
+    make_files(tmp_path, ['new.png'], age=0)
+
+    report = upload_gc.collect_orphans(FakeConnection(), str(tmp_path), log=lambda msg: None)
+
+    assert report['deleted'] == 1
+    assert report['recent'] == 1
+    assert report['resume_after'] is None
+    assert os.listdir(tmp_path) == ['new.png']
@@ -0,0 +1,40 @@
+from flask import Flask
+
+from uploads import uploads
+
+DIGEST = 'ab' * 32
+
+
+def make_client(root):
+    app = Flask(__name__, root_path=str(root))
+    app.config['UPLOAD_FOLDER'] = 'static/uploads'
+    app.register_blueprint(uploads)
+    return app.test_client()
+
+
+def test_relative_upload_folder_resolves_against_app_root(tmp_path, monkeypatch):
+    folder = tmp_path / 'static' / 'uploads'
+    folder.mkdir(parents=True)
+    (folder / f'{DIGEST}.png').write_bytes(b'png')
+    monkeypatch.chdir(tmp_path.parent)
+
+    response = make_client(tmp_path).get(f'/uploads/{DIGEST}.png')
+
+    assert response.status_code == 200
+    assert response.data == b'png'
+    assert 'immutable' in response.headers['Cache-Control']
+
+
+def test_missing_rendition_falls_back_to_original(tmp_path, monkeypatch):
+    folder = tmp_path / 'static' / 'uploads'
+    folder.mkdir(parents=True)
+    (folder / f'{DIGEST}.jpg').write_bytes(b'jpg')
+    monkeypatch.chdir(tmp_path.parent)
+
+    client = make_client(tmp_path)
+    response = client.get(f'/uploads/{DIGEST}_thumb.jpg')
+
+    assert response.status_code == 200
+    assert response.data == b'jpg'
+    assert response.headers['Cache-Control'] == 'public, no-cache'
+    assert client.get('/uploads/../secret.txt').status_code == 404
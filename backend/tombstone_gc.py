@@ -0,0 +1,40 @@
+"""Prune /api/sync tombstones older than the retention period.
+
+Usage: python tombstone_gc.py [--retention-days 90] [--batch-size 5000]
+
+Each batch commits on its own, so a large backlog never holds locks for long. Clients
+whose last seq predates a pruned tombstone get a 410 from /api/sync and resync from 0.
+"""
+import argparse
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from config import DB_CONFIG, SYNC_TOMBSTONE_RETENTION_DAYS
+from sync import prune_tombstones
+
+def collect_tombstones(conn, retention_days=SYNC_TOMBSTONE_RETENTION_DAYS, batch_size=5000):
+    total = 0
+    while True:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            pruned = prune_tombstones(cur, retention_days, batch_size)
+        conn.commit()
+        total += pruned
+        if pruned < batch_size:
+            return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--retention-days', type=int, default=SYNC_TOMBSTONE_RETENTION_DAYS)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        total = collect_tombstones(conn, args.retention_days, args.batch_size)
+    finally:
+        conn.close()
+    print(f"Pruned {total} tombstones older than {args.retention_days} days.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Delete upload files that no entry references any more.
+
+Usage: python upload_gc.py [--dry-run] [--grace 3600] [--batch-size 500] [--max-files N] [--checkpoint PATH]
+
+A run capped by --max-files scans the next N file names, in name order, after the one
+recorded in the checkpoint file, and records the last name it scanned; a run that reaches
+the end of the folder clears the checkpoint so the one after starts over.
+"""
+import argparse
+import heapq
+import os
+import time
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from config import DB_CONFIG
+from images import INCOMING_PREFIX
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
+# Kept outside the uploads folder, which is publicly served and would otherwise sweep it up
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.upload_gc_checkpoint')
+
+def get_db_connection():
+    return psycopg2.connect(**DB_CONFIG)
+
+def referenced_names(cur, names):
+    # Both lookups are served by expression indexes on entries, so each batch is one indexed query
+    cur.execute("""
+        SELECT n.name
+        FROM unnest(%s::text[]) AS n(name)
+        WHERE EXISTS (
+            SELECT 1 FROM entries
+            WHERE regexp_replace(entries.image_path, '^.*/', '') = n.name
+        )
+        OR EXISTS (
+            SELECT 1 FROM entries
+            WHERE entries.image_variants->>'hash' = substring(n.name from '^([0-9a-f]{64})')
+        )
+    """, (names,))
+    return {row['name'] for row in cur.fetchall()}
+
+def iter_batches(folder, batch_size, max_files=None, start_after=None):
+    with os.scandir(folder) as it:
+        entries = (entry for entry in it
+                   if entry.is_file(follow_symlinks=False) and (start_after is None or entry.name > start_after))
+        if max_files:
+            # A capped run takes the next max_files names after the checkpoint; only those are
+            # held and ordered, never the whole listing
+            entries = heapq.nsmallest(max_files, entries, key=lambda entry: entry.name)
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def read_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(resume_after, path=CHECKPOINT_FILE):
+    if resume_after is None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(resume_after)
+    os.replace(tmp_path, path)
+
+def collect_orphans(conn, folder=UPLOAD_FOLDER, grace_seconds=3600, batch_size=500, dry_run=False,
+                    max_files=None, start_after=None, log=print):
+    # resume_after is the last name scanned when max_files cut the run short, else None
+    report = {"scanned": 0, "recent": 0, "orphaned": 0, "deleted": 0, "reclaimed_bytes": 0, "errors": 0,
+              "resume_after": None}
+
+    for batch in iter_batches(folder, batch_size, max_files, start_after):
+        cutoff = time.time() - grace_seconds
+        report["scanned"] += len(batch)
+        if max_files and report["scanned"] >= max_files:
+            report["resume_after"] = batch[-1].name
+
+        # Anything touched inside the grace period may belong to an upload whose row isn't committed yet
+        candidates = {}
+        for entry in batch:
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                report["recent"] += 1
+            else:
+                candidates[entry.name] = stat.st_size
+
+        if not candidates:
+            continue
+
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            referenced = referenced_names(cur, [name for name in candidates if not name.startswith(INCOMING_PREFIX)])
+        conn.rollback()
+
+        for name, size in candidates.items():
+            if name in referenced:
+                continue
+            report["orphaned"] += 1
+            path = os.path.join(folder, name)
+            if dry_run:
+                log(f"Would delete {name} ({size} bytes)")
+                report["reclaimed_bytes"] += size
+                continue
+            try:
+                # Re-check: a dedupe hit refreshes the mtime of a file it is about to reuse
+                if os.stat(path).st_mtime > cutoff:
+                    report["recent"] += 1
+                    report["orphaned"] -= 1
+                    continue
+                os.unlink(path)
+                report["deleted"] += 1
+                report["reclaimed_bytes"] += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                report["errors"] += 1
+                log(f"Could not delete {name}: {e}")
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--folder', default=UPLOAD_FOLDER)
+    parser.add_argument('--grace', type=int, default=3600, help="Skip files modified within this many seconds")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--max-files', type=int, help="Stop after scanning this many files")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help="Where --max-files runs record their position")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    start_after = read_checkpoint(args.checkpoint) if args.max_files else None
+    conn = get_db_connection()
+    try:
+        report = collect_orphans(conn, args.folder, args.grace, args.batch_size, args.dry_run, args.max_files,
+                                 start_after)
+    finally:
+        conn.close()
+    if args.max_files and not args.dry_run:
+        write_checkpoint(report["resume_after"], args.checkpoint)
+
+    verb = "Would reclaim" if args.dry_run else "Reclaimed"
+    print(f"Scanned {report['scanned']} files, {report['orphaned']} orphaned, {report['recent']} inside grace period, "
+          f"{report['errors']} errors. {verb} {report['reclaimed_bytes'] / (1024 * 1024):.1f} MB.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import glob
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, Response, abort, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+uploads = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Content-addressed originals and their renditions, plus the older uuid-prefixed uploads.
+# Either way the bytes behind a name never change, so browsers may cache them forever.
+HASHED_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:_(?P<variant>[a-z]+))?\.[a-z0-9]+$')
+UUID_NAME = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_')
+
+def is_unique_name(filename):
+    return bool(HASHED_NAME.match(filename) or UUID_NAME.match(filename))
+
+def find_original(folder, filename):
+    # A rendition that hasn't been generated yet falls back to the uploaded original
+    match = HASHED_NAME.match(filename)
+    if not match or not match.group('variant'):
+        return None
+    candidates = glob.glob(os.path.join(folder, f"{match.group('digest')}.*"))
+    return os.path.basename(candidates[0]) if candidates else None
+
+def accel_response(filename, mimetype):
+    # Hand the transfer to the front proxy; it maps UPLOAD_ACCEL_PREFIX onto the upload folder
+    response = Response(mimetype=mimetype)
+    response.headers['X-Accel-Redirect'] = current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+    return response
+
+@uploads.route('/<path:filename>', methods=['GET', 'HEAD'])
+def serve_upload(filename):
+    # Resolved once against the app root, as send_from_directory would, so the existence
+    # check and the file actually sent can't disagree about where the folder is
+    folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    path = safe_join(folder, filename)
+    if path is None or os.path.basename(filename).startswith('.'):
+        abort(404)
+
+    immutable = is_unique_name(filename)
+    if not os.path.isfile(path):
+        filename = find_original(folder, filename)
+        if filename is None:
+            abort(404)
+        immutable = False
+
+    if current_app.config.get('UPLOAD_ACCEL_MODE') == 'x-accel':
+        response = accel_response(filename, mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    else:
+        # conditional=True gives us Range, If-Modified-Since and ETag handling; the body is
+        # a file wrapper, so servers with wsgi.file_wrapper support can use sendfile()
+        response = send_from_directory(folder, filename, conditional=True, etag=True,
+                                       max_age=IMMUTABLE_MAX_AGE if immutable else 0)
+
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
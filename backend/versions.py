@@ -0,0 +1,27 @@
+import hashlib
+
+# Every write bumps users.data_version inside its own transaction, so a
+# (user, version, URL) triple identifies one exact response body.
+#
+# Lock order: a write transaction takes the user's row (lock_user) before any entry or
+# note row. The change_seq triggers and bump_data_version() lock the user row as well,
+# so a path that locked an entry or note first could deadlock against one that didn't.
+
+def bump_data_version(cur, user_id):
+    cur.execute("UPDATE users SET data_version = data_version + 1 WHERE id = %s RETURNING data_version", (user_id,))
+    row = cur.fetchone()
+    return row['data_version'] if row else None
+
+def lock_user(cur, user_id):
+    # Takes the lock bump_data_version() would take anyway, but up front: a write that reads
+    # a row's prior state before upserting it must not race a concurrent insert of the same id
+    cur.execute("SELECT 1 FROM users WHERE id = %s FOR NO KEY UPDATE", (user_id,))
+
+def fetch_data_version(cur, user_id):
+    cur.execute("SELECT data_version FROM users WHERE id = %s", (user_id,))
+    row = cur.fetchone()
+    return row['data_version'] if row else None
+
+def data_version_etag(user_id, version, full_path):
+    digest = hashlib.sha1(f"{user_id}:{full_path}".encode('utf-8')).hexdigest()[:16]
+    return f"v{version}-{digest}"